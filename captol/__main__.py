@@ -8,12 +8,18 @@ parser.add_argument(
 parser.add_argument(
     '-d', '--devel-mode', action='store_true',
     help='Run application in developer mode.')
+subparsers = parser.add_subparsers(dest='command')
+
+from captol.frontend import cli
+cli.add_parsers(subparsers)
 
 args = parser.parse_args()
 create_sc: bool = args.create_shortcut
 devel_mode: bool = args.devel_mode
 
-if create_sc:
+if args.command is not None:
+    cli.run(args)
+elif create_sc:
     from captol.utils import shortcut
     shortcut.run()
 else:
@@ -0,0 +1,41 @@
+from __future__ import annotations
+from collections import defaultdict
+
+import numpy as np
+
+
+class BufferPool:
+
+    def __init__(self, depth: int = 8) -> None:
+        self.depth = depth
+        self.free = defaultdict(list)
+
+    def reserve(self, shape: tuple[int, ...], n: int) -> None:
+        free = self.free[shape]
+        while len(free) < min(n, self.depth):
+            free.append(np.empty(shape, dtype=np.uint8))
+
+    def take(self, shape: tuple[int, ...]) -> np.ndarray:
+        free = self.free.get(shape)
+        if free:
+            return free.pop()
+        return np.empty(shape, dtype=np.uint8)
+
+    def give(self, *arrays: np.ndarray) -> None:
+        for array in arrays:
+            free = self.free[array.shape]
+            if len(free) < self.depth:
+                free.append(array)
+
+
+class DiffWorkspace:
+
+    def __init__(self) -> None:
+        self.buffers = dict()
+
+    def get(self, shape: tuple[int, int]) -> tuple[np.ndarray, ...]:
+        buffers = self.buffers.get(shape)
+        if buffers is None:
+            buffers = self.buffers[shape] = tuple(
+                np.empty(shape, dtype=np.uint8) for _ in range(3))
+        return buffers
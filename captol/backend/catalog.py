@@ -0,0 +1,140 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+import os
+import sqlite3
+from threading import Lock
+from time import time
+
+from captol.backend.data import Environment, Rectangle
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    folder TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    taken_at REAL NOT NULL,
+    area TEXT,
+    x INTEGER, y INTEGER, w INTEGER, h INTEGER,
+    hash INTEGER,
+    score REAL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS captures_area_time ON captures(area, taken_at);
+CREATE INDEX IF NOT EXISTS captures_session ON captures(session_id, taken_at);
+CREATE INDEX IF NOT EXISTS captures_time ON captures(taken_at);
+CREATE INDEX IF NOT EXISTS captures_hash ON captures(hash);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions(started_at);
+"""
+
+
+class CaptureCatalog:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+        self.lock = Lock()
+        os.makedirs(os.path.dirname(env.catalog_file), exist_ok=True)
+        conn = self.conn = sqlite3.connect(
+            env.catalog_file, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+    def start_session(self, folder: str, source: str = 'screen') -> int:
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                'INSERT INTO sessions (started_at, folder, source) '
+                'VALUES (?, ?, ?)', (time(), folder, source))
+            return cur.lastrowid
+
+    def add(
+        self, session: int, path: str, area: str = None,
+        rect: Rectangle = None, hash_: int = None, score: float = None
+    ) -> None:
+        x = y = w = h = None
+        if rect is not None:
+            x, y, w, h = rect.x, rect.y, rect.w, rect.h
+        if hash_ is not None and hash_ >= 1 << 63:
+            hash_ -= 1 << 64
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO captures (session_id, taken_at, area, x, y, w, h, '
+                'hash, score, path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (session, time(), area, x, y, w, h, hash_, score,
+                 os.path.abspath(path)))
+
+    def query(
+        self, area: str = None, session: int = None,
+        since: datetime = None, until: datetime = None
+    ) -> list[str]:
+        conds, params = list(), list()
+        if area is not None:
+            conds.append('area = ?')
+            params.append(area)
+        if session is not None:
+            conds.append('session_id = ?')
+            params.append(session)
+        if since is not None:
+            conds.append('taken_at >= ?')
+            params.append(since.timestamp())
+        if until is not None:
+            conds.append('taken_at < ?')
+            params.append(until.timestamp())
+        where = ' WHERE ' + ' AND '.join(conds) if conds else ''
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT path FROM captures{where} ORDER BY taken_at, id',
+                params).fetchall()
+        return [path for path, in rows]
+
+    def sessions(self, day: datetime = None) -> list[dict]:
+        params = list()
+        where = ''
+        if day is not None:
+            start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+            where = ' WHERE s.started_at >= ? AND s.started_at < ?'
+            params = [start.timestamp(), (start + timedelta(1)).timestamp()]
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT s.id, s.started_at, MAX(c.taken_at), COUNT(c.id), '
+                'GROUP_CONCAT(DISTINCT c.area), s.folder, s.source '
+                'FROM sessions s JOIN captures c ON c.session_id = s.id'
+                f'{where} GROUP BY s.id ORDER BY s.started_at', params
+            ).fetchall()
+        keys = (
+            'id', 'started_at', 'ended_at', 'count', 'areas', 'folder',
+            'source')
+        sessions = list()
+        for row in rows:
+            session = dict(zip(keys, row))
+            session['started_at'] = datetime.fromtimestamp(row[1])
+            session['ended_at'] = datetime.fromtimestamp(row[2])
+            session['areas'] = row[4].split(',') if row[4] else list()
+            sessions.append(session)
+        return sessions
+
+    def session_at(self, when: datetime) -> int | None:
+        sessions = self.sessions(when)
+        for session in sessions:
+            if session['started_at'] <= when <= session['ended_at']:
+                return session['id']
+        if not sessions:
+            return None
+        nearest = min(
+            sessions, key=lambda s: abs(s['started_at'] - when))
+        return nearest['id']
+
+    def last_session(self) -> int | None:
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT session_id FROM captures '
+                'ORDER BY taken_at DESC, id DESC LIMIT 1').fetchone()
+        return row[0] if row is not None else None
@@ -6,7 +6,8 @@ import os
 from os.path import dirname
 from typing import Literal
 
-from captol.utils.const import ENV_FILE, AREA_FILE
+from captol.utils.const import (
+    ENV_FILE, AREA_FILE, CATALOG_FILE, PAGE_CACHE_DIR)
 
 
 class AreaDB:
@@ -83,16 +84,53 @@ class Rectangle:
 class Environment:
     theme: str = "darkly"
     area_file: str = AREA_FILE
-    default_save_folder: str = os.environ['HOMEPATH'].replace('\\', '/')
+    default_save_folder: str = os.environ.get(
+        'HOMEPATH', os.path.expanduser('~')).replace('\\', '/')
     pixel_difference_threshold: int = 10000
     image_duplication_check_steps: int = 1
+    comparison_scale: int = 1
+    pyramid_detection_levels: int = 2
+    pyramid_detection_margin: float = 0.5
+    session_hash_index: bool = True
+    hash_distance_threshold: int = 32
+    prefilter: bool = True
+    prefilter_histogram_factor: float = 1.0
+    parallel_diff_workers: int = 0
+    parallel_diff_tile: int = 256
     auto_clip_interval: float = 1.0
+    auto_clip_max_interval: float = 3.0
+    auto_clip_backoff: float = 1.2
+    settle_samples: int = 2
+    settle_interval: float = 0.2
+    settle_timeout: float = 3.0
+    ingest_sample_interval: float = 1.0
+    ingest_seek_frames: int = 300
+    profiling: bool = False
+    profiling_buffer_size: int = 4096
+    capture_format: Literal['png', 'webp', 'bmp'] = 'png'
+    png_compress_level: int = 6
+    webp_method: int = 4
+    writer_threads: int = 2
+    writer_queue_size: int = 4
     compress_before_pdf_conversion: bool = True
     compression_ratio: int = 85
     resize_before_pdf_conversion: bool = False
     resized_height: int = 720
+    pdf_streaming: bool = True
+    pdf_chunk_size: int = 50
+    pdf_append: bool = False
+    pdf_workers: int = 0
+    pdf_dedup_pages: bool = False
+    pdf_dedup_tolerance: int = 8
+    page_cache_size_mb: int = 512
+    page_cache_dir: str = PAGE_CACHE_DIR
     zip_converted_images: bool = True
+    archive_workers: int = 4
+    dedup_scale: int = 4
+    dedup_chunk_size: int = 256
     pdf_restriction: bool = True
+    capture_catalog: bool = True
+    catalog_file: str = CATALOG_FILE
 
     def __post_init__(self) -> None:
         self.load()
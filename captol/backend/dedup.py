@@ -0,0 +1,250 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+from PIL import Image
+from typing import Callable
+
+import cv2
+import numpy as np
+
+from captol.backend.data import Environment
+from captol.backend.extraction import blur_kernel, to_luminance
+from captol.backend.manifest import CaptureManifest, NAME_PATTERN
+from captol.backend.source import natural_key
+from captol.utils.const import DIFF_LEVEL
+
+
+DUPLICATE_DIR = 'duplicates'
+SIGNATURE_SIZE = (32, 32)
+SIGNATURE_LEVEL = 12
+MAX_CANDIDATES = 4
+SIGNATURE_CAPACITY = 64
+THUMB_CACHE_SIZE = 16
+
+
+class BatchDeduplicator:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+
+    def find_duplicates(
+        self, folder: str, progress: Callable[[int, int], None] = None
+    ) -> dict[str, list[str]]:
+        names = sorted(
+            [name for name in os.listdir(folder) if NAME_PATTERN.match(name)],
+            key=natural_key)
+        paths = [os.path.join(folder, name) for name in names]
+        chunk = max(1, self.env.dedup_chunk_size)
+
+        # As in the live check, each capture is compared with the frame its
+        # run started from, never with other members, so a gradual build
+        # does not chain into one group. The last, most complete frame of
+        # a run is kept.
+        groups = dict()
+        run, anchor = list(), None
+        with ThreadPoolExecutor() as pool:
+            for start in range(0, len(paths), chunk):
+                stop = min(start + chunk, len(paths))
+                loaded = [
+                    (path, thumb) for path, thumb in zip(
+                        paths[start:stop],
+                        pool.map(self._load, paths[start:stop]))
+                    if thumb is not None]
+                thumbs = [thumb for _, thumb in loaded]
+                i = 0
+                while i < len(loaded):
+                    if anchor is not None:
+                        end = self._similar_until(anchor, thumbs, i)
+                        run += [path for path, _ in loaded[i:end]]
+                        i = end
+                    if i < len(loaded):
+                        if len(run) > 1:
+                            groups[run[-1]] = run[:-1]
+                        path, anchor = loaded[i]
+                        run = [path]
+                        i += 1
+                if progress is not None:
+                    progress(stop, len(paths))
+        if len(run) > 1:
+            groups[run[-1]] = run[:-1]
+        return groups
+
+    def run(self, folder: str, delete: bool = False) -> dict[str, list[str]]:
+        groups = self.find_duplicates(folder)
+        manifest = CaptureManifest(folder)
+        dupdir = os.path.join(folder, DUPLICATE_DIR)
+        for duplicates in groups.values():
+            for path in duplicates:
+                try:
+                    if delete:
+                        os.remove(path)
+                    else:
+                        os.makedirs(dupdir, exist_ok=True)
+                        shutil.move(path, dupdir)
+                except FileNotFoundError:
+                    pass
+                manifest.remove(os.path.basename(path))
+        return groups
+
+    def _load(self, path: str) -> np.ndarray | None:
+        return load_thumbnail(path, self.env.dedup_scale)
+
+    def _similar_until(
+        self, anchor: np.ndarray, thumbs: list[np.ndarray], start: int
+    ) -> int:
+        # Most captures start a run of their own, so the anchor is checked
+        # against the next capture alone first, then against a stack that
+        # doubles while the run goes on. Comparing it with the whole chunk
+        # at once would make a chunk of distinct captures quadratic.
+        pos, size = start, 1
+        while pos < len(thumbs):
+            stack = list()
+            for thumb in thumbs[pos:pos + size]:
+                if thumb.shape != anchor.shape:
+                    break
+                stack.append(thumb)
+            if not stack:
+                break
+            stack = np.stack(stack)
+            pix = batch_different_pixels(
+                np.repeat(anchor[None], len(stack), axis=0), stack,
+                self.env.dedup_scale)
+            over = np.flatnonzero(pix > self.env.pixel_difference_threshold)
+            if len(over):
+                return pos + int(over[0])
+            pos += len(stack)
+            if len(stack) < size:
+                break
+            size *= 2
+        return pos
+
+
+class PageDeduplicator:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+        self.signatures = np.empty(
+            (SIGNATURE_CAPACITY, *SIGNATURE_SIZE[::-1]), dtype=np.uint8)
+        self.thumbs = OrderedDict()
+        self.paths = list()
+        self.removed = dict()
+
+    def is_duplicate(
+        self, path: str, signature: np.ndarray, thumb: np.ndarray) -> bool:
+        for i in self._candidates(signature):
+            if self._confirm(thumb, self._thumb(i)):
+                self.removed[path] = self.paths[i]
+                return True
+        n = len(self.paths)
+        if n == len(self.signatures):
+            grown = np.empty(
+                (2 * n, *self.signatures.shape[1:]), dtype=np.uint8)
+            grown[:n] = self.signatures
+            self.signatures = grown
+        self.signatures[n] = signature
+        self.paths.append(path)
+        self._keep(n, thumb)
+        return False
+
+    def _candidates(self, signature: np.ndarray) -> list[int]:
+        # Signatures only shortlist pages, the previous one first. The
+        # pixel check then decides as the batch deduplicator does.
+        n = len(self.paths)
+        if not n:
+            return list()
+        cells = _differing_cells(self.signatures[:n], signature)
+        order = np.argsort(cells, kind='stable')[:MAX_CANDIDATES]
+        hits = [
+            int(i) for i in order
+            if cells[i] <= self.env.pdf_dedup_tolerance]
+        last = n - 1
+        if cells[last] <= self.env.pdf_dedup_tolerance:
+            hits = [last] + [i for i in hits if i != last]
+        return hits
+
+    def _thumb(self, i: int) -> np.ndarray | None:
+        # Only the latest pages and recent shortlist hits stay in memory;
+        # an older page is decoded again when a later one resembles it.
+        thumb = self.thumbs.get(i)
+        if thumb is None:
+            features = load_page_features(
+                self.paths[i], None, max(1, self.env.dedup_scale))
+            if features is None:
+                return None
+            thumb = features[1]
+        self._keep(i, thumb)
+        return thumb
+
+    def _keep(self, i: int, thumb: np.ndarray) -> None:
+        self.thumbs[i] = thumb
+        self.thumbs.move_to_end(i)
+        while len(self.thumbs) > THUMB_CACHE_SIZE:
+            self.thumbs.popitem(last=False)
+
+    def _confirm(
+        self, thumb1: np.ndarray, thumb2: np.ndarray | None) -> bool:
+        if thumb2 is None or thumb1.shape != thumb2.shape:
+            return False
+        pix = batch_different_pixels(
+            thumb1[None], thumb2[None], self.env.dedup_scale)
+        return pix[0] <= self.env.pixel_difference_threshold
+
+
+def load_thumbnail(path: str, scale: int) -> np.ndarray | None:
+    try:
+        with Image.open(path) as image:
+            imarr = np.asarray(image.convert('RGB'))
+    except (OSError, ValueError):
+        return None
+    return to_luminance(imarr, scale)
+
+
+def page_features(
+    image: Image.Image, size: tuple[int, int], scale: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # The thumbnail is measured against the source size, so pages decoded
+    # from a resized or drafted copy still compare in source pixels.
+    gray = np.asarray(image.convert('L'))
+    w, h = size
+    thumb = cv2.resize(
+        gray, (max(1, w // scale), max(1, h // scale)),
+        interpolation=cv2.INTER_AREA)
+    signature = cv2.resize(
+        thumb, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    return signature, thumb
+
+
+def load_page_features(
+    path: str, size: tuple[int, int] | None, scale: int
+) -> tuple[np.ndarray, np.ndarray] | None:
+    # Only small planes are needed here, so JPEG pages are decoded at a
+    # reduced scale.
+    try:
+        with Image.open(path) as image:
+            size = size or image.size
+            image.draft('L', (size[0] // scale, size[1] // scale))
+            return page_features(image, size, scale)
+    except (OSError, ValueError):
+        return None
+
+
+def _differing_cells(
+    signatures: np.ndarray, signature: np.ndarray) -> np.ndarray:
+    dif = np.abs(signatures.astype(np.int16) - signature)
+    return np.count_nonzero(dif > SIGNATURE_LEVEL, axis=(1, 2))
+
+
+def batch_different_pixels(
+    grays1: np.ndarray, grays2: np.ndarray, scale: int = 1) -> np.ndarray:
+    ksize, sigma = blur_kernel(scale)
+    pad = ksize // 2
+    n, h, w = grays1.shape
+    dif = cv2.absdiff(grays1.reshape(n * h, w), grays2.reshape(n * h, w))
+    dif = np.pad(
+        dif.reshape(n, h, w), ((0, 0), (pad, pad), (pad, pad)), mode='reflect')
+    mosaic = dif.reshape(n * (h + 2*pad), w + 2*pad)
+    blr = cv2.GaussianBlur(mosaic, (ksize, ksize), sigma)
+    blr = blr.reshape(n, h + 2*pad, w + 2*pad)[:, pad:pad+h, pad:pad+w]
+    return np.count_nonzero(blr > DIFF_LEVEL, axis=(1, 2)) * scale**2
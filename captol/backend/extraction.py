@@ -1,78 +1,193 @@
 from __future__ import annotations
-from collections import deque
-from dataclasses import dataclass
+from collections import Counter, deque
+from dataclasses import dataclass, field
 from datetime import date
+from math import isqrt
 import os
-import pathlib
-from PIL import Image, ImageGrab
-import re
-import tkinter as tk
+from PIL import Image
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Callable
 
 import cv2
 import numpy as np
+from captol.backend.buffers import BufferPool, DiffWorkspace
+from captol.backend.catalog import CaptureCatalog
 from captol.backend.data import Rectangle, Environment
+from captol.backend.hashing import (
+    HashIndex, INDEX_HASH_SIZE, INDEX_SCALE, dhash)
+from captol.backend.manifest import CaptureManifest
+from captol.backend.parallel import PARALLEL_MIN_PIXELS, DiffPool
+from captol.backend.profiling import PROFILER
+from captol.backend.source import FrameSource, ScreenSource
+from captol.backend.writing import ImageWriter, write_image
+from captol.utils.const import DIFF_LEVEL
+
+if TYPE_CHECKING:
+    import tkinter as tk
+
+
+MIN_PYRAMID_SIDE = 16
+SETTLE_SCALE = 4
+PROBE_SAMPLES = 4096
+HISTOGRAM_BINS = 16
+HISTOGRAM_CELLS = 4
+PREFILTER_STAGES = ('sample', 'histogram', 'diff')
 
 
 class Clipper:
 
-    def __init__(self) -> None:
+    def __init__(self, source: FrameSource = None) -> None:
         self.area = None
+        self.source = source if source is not None else ScreenSource()
 
     def register(self, area: Rectangle) -> None:
         self.area = area
 
-    def clip(self) -> Image:
+    def clip(self) -> Image | None:
         area = self.area
+        if area is None:
+            with PROFILER.stage('grab'):
+                return self.source.grab()
         x1, y1 = area.x, area.y
         x2, y2 = x1 + area.w, y1 + area.h
-        image = ImageGrab.grab(bbox=(x1, y1, x2, y2), all_screens=True)
+        with PROFILER.stage('grab'):
+            image = self.source.grab(bbox=(x1, y1, x2, y2))
         return image
 
 
+class MultiClipper:
+
+    def __init__(self, source: FrameSource = None) -> None:
+        self.areas = dict()
+        self.source = source if source is not None else ScreenSource()
+
+    @property
+    def bbox(self) -> tuple[int]:
+        rect = bounding_rect(self.areas.values())
+        return rect.x, rect.y, rect.x + rect.w, rect.y + rect.h
+
+    def register(self, name: str, area: Rectangle) -> None:
+        self.areas[name] = area
+
+    def unregister(self, name: str) -> None:
+        del self.areas[name]
+
+    def clip(self) -> dict[str, np.ndarray] | None:
+        x1, y1, _, _ = bbox = self.bbox
+        with PROFILER.stage('grab'):
+            image = self.source.grab(bbox=bbox)
+        if image is None:
+            return None
+        frame = np.asarray(image)
+        views = dict()
+        for name, area in self.areas.items():
+            x, y = area.x - x1, area.y - y1
+            views[name] = frame[y:y+area.h, x:x+area.w]
+        return views
+
+
 class ImageCounter:
 
-    def __init__(self, ext: str, var_past: tk.IntVar, var_today: tk.IntVar) -> None:
-        self.ext = ext
-        self.var_past = var_past
-        self.var_today = var_today
+    def __init__(self, env: Environment, parent: ImageCounter = None) -> None:
+        self.env = env
+        self.parent = parent
+        self.n_past = 0
+        self.n_today = 0
+        self.vars = None
         self.basedir = None
+        self.manifest = None
+        self.catalog = None
+        self.session = None
+        self.source = 'screen'
         self.date = None
         self.lastnum = None
 
         self._set_stemname()
 
+    @property
+    def ext(self) -> str:
+        return self.env.capture_format
+
     def next_savepath(self) -> str:
-        nextnum = self._advance_num()
-        name = f'{self.date}_{nextnum}.{self.ext}'
-        path = os.path.join(self.basedir, name)
-        if os.path.isfile(path):
-            self.next_savepath()
-        return path
+        while True:
+            nextnum = self._advance_num()
+            name = f'{self.date}_{nextnum}.{self.ext}'
+            path = os.path.join(self.basedir, name)
+            if name in self.manifest:
+                continue
+            if not os.path.isfile(path):
+                return path
+            self._reconcile()
+
+    def register(
+        self, path: str, area: str = None, image: PathAssignedImage = None,
+        rect: Rectangle = None
+    ) -> None:
+        size = hash_ = score = None
+        if image is not None:
+            size, hash_ = [image.size[1], image.size[0]], image.hash
+            score = image.score
+        self.manifest.append(os.path.basename(path), area, size, hash_)
+        # Counters of the areas of one run record into their parent's
+        # catalog session.
+        owner = self.parent if self.parent is not None else self
+        if owner.catalog is not None:
+            if owner.session is None:
+                owner.session = owner.catalog.start_session(
+                    owner.basedir, owner.source)
+            owner.catalog.add(owner.session, path, area, rect, hash_, score)
+
+    def new_session(self, source: str = None) -> None:
+        self.session = None
+        if source is not None:
+            self.source = source
 
     def set_dir(self, basedir: str) -> None:
         self.basedir = basedir
 
+    def bind(self, var_past: tk.IntVar, var_today: tk.IntVar) -> None:
+        self.vars = (var_past, var_today)
+        self._notify()
+
     def up(self, value: int) -> None:
-        self.var_today.set(self.var_today.get() + value)
+        self.n_today += value
+        self._notify()
 
     def down(self, value: int) -> None:
-        self.var_today.set(self.var_today.get() - value)
+        self.n_today -= value
+        self._notify()
+
+    def close(self) -> None:
+        if self.catalog is not None:
+            self.catalog.close()
+            self.catalog = None
 
     def initialize_count(self) -> None:
-        date_pattern = re.compile('(\d{4})-(\d{2})-(\d{2})_(\d+)\.')
-        today_pattern = re.compile(f'{self.date}_(\d+)\.')
-        num_pattern = re.compile('_(\d+)\.')
-        dirimages = pathlib.Path(self.basedir).glob(f'*.{self.ext}')
-        matchnames = [p.name for p in dirimages if date_pattern.match(p.name)]
-        todaynums = [
-            int(num_pattern.findall(p)[0]) for p in matchnames
-            if today_pattern.match(p)]
-
-        n_today = len(todaynums)
-        n_past = len(matchnames) - n_today
-        self.var_past.set(n_past)
-        self.var_today.set(n_today)
-        self.lastnum = max(todaynums+[0])
+        self.manifest = CaptureManifest(self.basedir)
+        if self.env.capture_catalog and self.catalog is None \
+                and self.parent is None:
+            self.catalog = CaptureCatalog(self.env)
+        self.session = None
+        self._update_count()
+
+    def _reconcile(self) -> None:
+        lastnum = self.lastnum
+        self.manifest.reconcile()
+        self._update_count()
+        self.lastnum = max(self.lastnum, lastnum)
+
+    def _update_count(self) -> None:
+        manifest = self.manifest
+        self.n_today = manifest.count(self.date)
+        self.n_past = manifest.total - self.n_today
+        self.lastnum = manifest.lastnum(self.date)
+        self._notify()
+
+    def _notify(self) -> None:
+        if self.vars is not None:
+            var_past, var_today = self.vars
+            var_past.set(self.n_past)
+            var_today.set(self.n_today)
 
     def _set_stemname(self) -> None:
         today = format(date.today())
@@ -89,37 +204,141 @@ class ImageBuffer:
     def __init__(self, env: Environment) -> None:
         self.env = env
         self.q = deque(maxlen=env.image_duplication_check_steps)
+        self.index = HashIndex(env)
+        self.settler = Settler(env)
+        self.writer = None
+        self.pool = None
+        self.arrays = BufferPool()
+        self.work = DiffWorkspace()
         self.new = None
+        self.score = None
+        self.hits = Counter()
+
+        if env.writer_threads > 0:
+            self.writer = ImageWriter(env.writer_threads, env.writer_queue_size)
+        if env.parallel_diff_workers > 0:
+            self.pool = DiffPool(env)
+
+    def set_dir(self, basedir: str) -> None:
+        if self.env.session_hash_index:
+            self.index.set_dir(basedir)
+
+    def reserve(self, area: Rectangle) -> None:
+        scale = self.env.comparison_scale
+        shape = (max(1, area.h // scale), max(1, area.w // scale))
+        n = self.env.image_duplication_check_steps + 3
+        if scale > 1:
+            self.arrays.reserve((area.h, area.w), 1)
+        for level in range(self.env.pyramid_detection_levels + 1):
+            if min(shape) < MIN_PYRAMID_SIDE:
+                break
+            self.arrays.reserve(shape, n)
+            self.work.get(shape)
+            shape = ((shape[0] + 1) // 2, (shape[1] + 1) // 2)
 
     def hold(self, image: Image) -> None:
-        self.new = PathAssignedImage(image)
+        self._recycle(self.new)
+        self.new = PathAssignedImage(
+            image, scale=self.env.comparison_scale, arrays=self.arrays)
+        self.score = None
 
     def rehold(self, past_step: int) -> None:
         idx = -past_step
         self.new = self.q[idx]
 
     def release(self) -> None:
+        self._recycle(self.new)
         self.new = None
 
-    def save(self, path: str) -> None:
+    def save(self, path: str) -> PathAssignedImage:
         if self.new is None:
             raise Exception('No object to save. Hold it first.')
 
         new = self.new
-        new.color.save(path)
-        new.path = path
+        color = new.color
+        if color is None:
+            raise Exception('Object has already been saved.')
+        if isinstance(color, np.ndarray):
+            color = Image.fromarray(color)
+        params = self._save_params(path)
+        if self.writer is not None:
+            self.writer.put(color, path, **params)
+        else:
+            write_image(color, path, **params)
+        new.persist(path)
+        new.score = self.score
+        evicted = None
+        if len(self.q) == self.q.maxlen:
+            evicted = self.q[0]
         self.q.append(new)
+        self._recycle(evicted)
+        if self.env.session_hash_index:
+            hash_, plane = new.index_entry()
+            self.index.add(hash_, path, plane)
         self.release()
+        return new
+
+    def flush(self) -> None:
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
 
     def delete(self, past_step: int) -> None:
         idx = -past_step
         target = self.q[idx]
+        if self.writer is not None:
+            self.writer.cancel(target.path)
         try:
             os.remove(target.path)
         except FileNotFoundError:
             pass
         finally:
+            self.index.discard(target.path)
             del self.q[idx]
+            self._recycle(target)
+
+    def check_new(
+        self, clip: Callable[[], Image | None] = None) -> bool:
+        if self.is_duplicate():
+            self.release()
+            return False
+        if clip is None or self.env.settle_samples <= 0:
+            return True
+
+        held = self.new.color
+        image = self.settler.settle(held, clip)
+        if image is not held:
+            self.hold(image)
+            if self.is_duplicate(record=False):
+                self.release()
+                return False
+        return True
+
+    def is_duplicate(self, record: bool = True) -> bool:
+        # A re-check of the settled frame is left out of the prefilter and
+        # score statistics, which count one check per tick.
+        hits = self.hits
+        if not record:
+            self.hits = Counter()
+        try:
+            for i in range(self.env.image_duplication_check_steps):
+                if self.compare_similarity(i+1):
+                    return True
+            return self.compare_indexed()
+        finally:
+            self.hits = hits
+            if record and self.score is not None:
+                PROFILER.score(self.score)
 
     def compare_similarity(self, past_step: int) -> bool:
         if self.new is None:
@@ -129,34 +348,416 @@ class ImageBuffer:
             return False
 
         idx = -past_step
-        target = self.q[idx]
-        new = self.new
+        return self._is_similar(self.new, self.q[idx])
+
+    def compare_indexed(self) -> bool:
+        if self.new is None:
+            raise Exception('No object to compare. Hold new image first.')
+
+        if not self.env.session_hash_index:
+            return False
 
+        # Candidates are verified on the small planes kept by the index, so
+        # a lookup never waits for the writer or decodes a saved capture
+        # of this session.
+        new = self.new
+        hash_, plane = new.index_entry()
+        scale = new.plane_scale
+        checked = [past.path for past in self.q]
+        for path, stored in self.index.lookup(hash_):
+            if path in checked:
+                continue
+            if stored is None:
+                stored = self._load_plane(path, scale)
+                if stored is None:
+                    continue
+            if stored.shape != plane.shape:
+                continue
+            with PROFILER.stage('diff'):
+                pix = count_different_pixels(plane, stored, scale)
+            if self.score is None or pix < self.score:
+                self.score = pix
+            if pix <= self.env.pixel_difference_threshold:
+                return True
+        return False
+
+    def _load_plane(self, path: str, scale: int) -> np.ndarray | None:
+        try:
+            with Image.open(path) as image:
+                gray = np.asarray(image.convert('L'))
+        except (OSError, ValueError):
+            self.index.discard(path)
+            return None
+        plane = to_luminance(gray, scale)
+        self.index.set_plane(path, plane)
+        return plane
+
+    def _is_similar(
+        self, new: PathAssignedImage, target: PathAssignedImage) -> bool:
         if new.size != target.size:
             return False
 
-        pix = self._calculate_different_pixels(new.gray, target.gray)
+        pix = None
+        if self.env.prefilter:
+            with PROFILER.stage('prefilter'):
+                pix = self._prefilter(new, target)
+        if pix is None:
+            with PROFILER.stage('diff'):
+                pix = self._estimate_different_pixels(new, target)
+        if self.score is None or pix < self.score:
+            self.score = pix
         if pix > self.env.pixel_difference_threshold:
             return False
         return True
 
-    def _calculate_different_pixels(
-        self, gray_image1: Image, gray_image2: Image) -> float:
-        dif = cv2.absdiff(gray_image1, gray_image2)
-        blr = cv2.GaussianBlur(dif, (15, 15), 5)
-        thr = cv2.threshold(blr, 50, 255, cv2.THRESH_BINARY)[1]
-        pix = np.sum(thr) / 255
-        return pix
+    def prefilter_stats(self) -> dict[str, float]:
+        return hit_rates(self.hits)
+
+    def _prefilter(
+        self, new: PathAssignedImage, target: PathAssignedImage
+    ) -> float | None:
+        # No pixel differing by more than DIFF_LEVEL means the blurred diff
+        # cannot cross the threshold either, so the count is exactly zero.
+        # The sparse samples only decide whether the full check is worth it.
+        # Per-cell histograms then bound how many samples must have moved
+        # further than DIFF_LEVEL, which a fade or a cursor hardly ever does.
+        if cv2.norm(new.sample(), target.sample(), cv2.NORM_INF) <= DIFF_LEVEL \
+                and cv2.norm(new.gray, target.gray, cv2.NORM_INF) <= DIFF_LEVEL:
+            self.hits['sample'] += 1
+            return 0.0
+
+        moved = histogram_excess(new.histogram(), target.histogram())
+        pix = moved * new.gray.size * new.scale**2
+        threshold = self.env.pixel_difference_threshold
+        if pix > threshold * self.env.prefilter_histogram_factor:
+            self.hits['histogram'] += 1
+            return pix
+
+        self.hits['diff'] += 1
+        return None
+
+    def _recycle(self, image: PathAssignedImage | None) -> None:
+        if image is None or any(image is past for past in self.q):
+            return
+        image.recycle()
+
+    def _save_params(self, path: str) -> dict:
+        ext = os.path.splitext(path)[1][1:].lower()
+        if ext == 'png':
+            return {'compress_level': self.env.png_compress_level}
+        if ext == 'webp':
+            return {'lossless': True, 'method': self.env.webp_method}
+        return dict()
+
+    def _estimate_different_pixels(
+        self, new: PathAssignedImage, target: PathAssignedImage) -> float:
+        threshold = self.env.pixel_difference_threshold
+        margin = self.env.pyramid_detection_margin
+        for level in range(self.env.pyramid_detection_levels, 0, -1):
+            gray1, gray2 = new.pyramid(level), target.pyramid(level)
+            if gray1 is None or gray2 is None:
+                continue
+            scale = new.scale * 2**level
+            pix = count_different_pixels(gray1, gray2, scale, self.work)
+            if pix > threshold * (1 + margin) or pix < threshold * (1 - margin):
+                return pix
+        if self.pool is not None and new.gray.size >= PARALLEL_MIN_PIXELS:
+            ksize, sigma = blur_kernel(new.scale)
+            return self.pool.count(
+                new.gray, target.gray, new.scale, ksize, sigma, threshold)
+        return count_different_pixels(
+            new.gray, target.gray, new.scale, self.work)
+
+
+
+class MultiAreaCapture:
+
+    def __init__(self, env: Environment, clipper: MultiClipper) -> None:
+        self.env = env
+        self.clipper = clipper
+        self.settler = Settler(env)
+        self.buffers = dict()
+        self.counters = dict()
+
+    def add(self, name: str, area: Rectangle, counter: ImageCounter) -> None:
+        os.makedirs(counter.basedir, exist_ok=True)
+        imbuffer = self.buffers[name] = ImageBuffer(self.env)
+        imbuffer.set_dir(counter.basedir)
+        imbuffer.reserve(area)
+        self.counters[name] = counter
+        self.clipper.register(name, area)
+
+    def capture(self, check_duplication: bool = True) -> list[str] | None:
+        views = self.clipper.clip()
+        if views is None:
+            return None
+
+        names = list(views.keys())
+        if check_duplication:
+            names = self._hold_changed(views, names)
+            if names and self.env.settle_samples > 0:
+                # Only the changed areas have to come to rest; another area
+                # may keep moving (a cursor, a video) without delaying them.
+                def clip() -> dict[str, np.ndarray] | None:
+                    views = self.clipper.clip()
+                    if views is None:
+                        return None
+                    return {name: views[name] for name in names}
+
+                views = self.settler.settle(
+                    {name: views[name] for name in names}, clip)
+                names = self._hold_changed(views, names, record=False)
+        else:
+            for name in names:
+                self.buffers[name].hold(views[name])
+
+        saved = list()
+        for name in names:
+            imbuffer, counter = self.buffers[name], self.counters[name]
+            rect = self.clipper.areas[name]
+            path = counter.next_savepath()
+            counter.register(path, name, imbuffer.save(path), rect)
+            counter.up(1)
+            saved.append(path)
+        return saved
+
+    def flush(self) -> None:
+        for imbuffer in self.buffers.values():
+            imbuffer.flush()
+
+    def close(self) -> None:
+        errors = list()
+        for imbuffer in self.buffers.values():
+            try:
+                imbuffer.close()
+            except Exception as e:
+                errors.append(e)
+        for counter in self.counters.values():
+            counter.close()
+        if errors:
+            raise errors[0]
+
+    def _hold_changed(
+        self, views: dict[str, np.ndarray], names: list[str],
+        record: bool = True
+    ) -> list[str]:
+        changed = list()
+        for name in names:
+            imbuffer = self.buffers[name]
+            imbuffer.hold(views[name])
+            if imbuffer.is_duplicate(record):
+                imbuffer.release()
+            else:
+                changed.append(name)
+        return changed
+
+
+class Settler:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+        self.outcomes = Counter()
+
+    def settle(
+        self, frame: Image | dict[str, np.ndarray],
+        clip: Callable[[], Image | dict[str, np.ndarray] | None]
+    ) -> Image | dict[str, np.ndarray]:
+        env = self.env
+        prev = self._sample(frame)
+        stable = 0
+        deadline = monotonic() + env.settle_timeout
+        while stable < env.settle_samples and monotonic() < deadline:
+            sleep(env.settle_interval)
+            latest = clip()
+            if latest is None:
+                break
+            cur = self._sample(latest)
+            stable = stable + 1 if self._is_stable(prev, cur) else 0
+            frame, prev = latest, cur
+        self.outcomes[
+            'settled' if stable >= env.settle_samples else 'exhausted'] += 1
+        return frame
+
+    def _sample(
+        self, frame: Image | dict[str, np.ndarray]) -> list[np.ndarray]:
+        frames = frame.values() if isinstance(frame, dict) else [frame]
+        return [to_luminance(np.asarray(f), SETTLE_SCALE) for f in frames]
+
+    def _is_stable(
+        self, prev: list[np.ndarray], cur: list[np.ndarray]) -> bool:
+        # Residual motion below the dedup threshold could not make a new
+        # capture on its own, so a video tile or a cursor counts as at rest.
+        threshold = self.env.pixel_difference_threshold
+        for gray1, gray2 in zip(prev, cur):
+            if gray1.shape != gray2.shape:
+                return False
+            if count_different_pixels(gray1, gray2, SETTLE_SCALE) > threshold:
+                return False
+        return True
 
 
 @dataclass
 class PathAssignedImage:
-    color: Image
+    color: Image | np.ndarray | None
     path: str = None
-    gray: Image = None
+    scale: int = 1
+    gray: np.ndarray = None
     size: tuple[int] = None
+    mode: str = 'RGB'
+    hash: int = None
+    levels: list = field(default_factory=list)
+    probe: np.ndarray = None
+    hist: np.ndarray = None
+    index_hash: int = None
+    plane: np.ndarray = None
+    score: float = None
+    arrays: BufferPool = None
+    pooled: bool = False
 
     def __post_init__(self) -> None:
-        imarr = np.array(self.color)
-        self.gray = cv2.cvtColor(imarr, 0)
-        self.size = imarr.shape
+        with PROFILER.stage('convert'):
+            imarr = np.asarray(self.color)
+            self.gray = to_luminance(imarr, self.scale, self.arrays)
+            self.pooled = self.gray is not imarr and self.arrays is not None
+            self.size = imarr.shape
+            self.mode = getattr(self.color, 'mode', self.mode)
+            self.hash = dhash(self.gray)
+
+    def persist(self, path: str) -> None:
+        self.path = path
+        self.color = None
+
+    def recycle(self) -> None:
+        arrays = self.arrays
+        if arrays is None:
+            return
+        if self.pooled:
+            arrays.give(self.gray)
+        arrays.give(*self.levels[1:])
+        self.gray = None
+        self.levels.clear()
+
+    @property
+    def plane_scale(self) -> int:
+        return self.scale * max(1, INDEX_SCALE // self.scale)
+
+    def index_entry(self) -> tuple[int, np.ndarray]:
+        if self.plane is None:
+            factor = self.plane_scale // self.scale
+            plane = to_luminance(self.gray, factor)
+            # The gray plane goes back to the pool, so it is never shared.
+            self.plane = plane.copy() if plane is self.gray else plane
+            self.index_hash = dhash(self.plane, INDEX_HASH_SIZE)
+        return self.index_hash, self.plane
+
+    def sample(self) -> np.ndarray:
+        if self.probe is None:
+            gray = self.gray
+            step = max(1, isqrt(gray.size // PROBE_SAMPLES))
+            self.probe = np.ascontiguousarray(gray[::step, ::step])
+        return self.probe
+
+    def histogram(self) -> np.ndarray:
+        if self.hist is None:
+            probe = self.sample()
+            h, w = probe.shape
+            hist = np.zeros((HISTOGRAM_CELLS**2, HISTOGRAM_BINS))
+            for i in range(HISTOGRAM_CELLS):
+                for j in range(HISTOGRAM_CELLS):
+                    cell = probe[
+                        i * h // HISTOGRAM_CELLS:(i + 1) * h // HISTOGRAM_CELLS,
+                        j * w // HISTOGRAM_CELLS:(j + 1) * w // HISTOGRAM_CELLS]
+                    hist[i * HISTOGRAM_CELLS + j] = np.bincount(
+                        cell.ravel() // (256 // HISTOGRAM_BINS),
+                        minlength=HISTOGRAM_BINS)
+            self.hist = hist / probe.size
+        return self.hist
+
+    def pyramid(self, level: int) -> np.ndarray | None:
+        levels = self.levels
+        if not levels:
+            levels.append(self.gray)
+        while len(levels) <= level:
+            prev = levels[-1]
+            if min(prev.shape[:2]) < 2 * MIN_PYRAMID_SIDE:
+                return None
+            if self.arrays is None:
+                levels.append(cv2.pyrDown(prev))
+            else:
+                h, w = prev.shape
+                dst = self.arrays.take(((h + 1) // 2, (w + 1) // 2))
+                levels.append(cv2.pyrDown(prev, dst=dst))
+        return levels[level]
+
+
+def blur_kernel(scale: int = 1) -> tuple[int, float]:
+    return max(3, (15 // scale) | 1), 5 / scale
+
+
+def count_different_pixels(
+    gray1: np.ndarray, gray2: np.ndarray, scale: int = 1,
+    work: DiffWorkspace = None
+) -> float:
+    ksize, sigma = blur_kernel(scale)
+    dif = blr = thr = None
+    if work is not None:
+        dif, blr, thr = work.get(gray1.shape)
+    dif = cv2.absdiff(gray1, gray2, dst=dif)
+    blr = cv2.GaussianBlur(dif, (ksize, ksize), sigma, dst=blr)
+    thr = cv2.threshold(blr, DIFF_LEVEL, 255, cv2.THRESH_BINARY, dst=thr)[1]
+    pix = float(cv2.countNonZero(thr) * scale**2)
+    return pix
+
+
+def hit_rates(hits: Counter) -> dict[str, float]:
+    total = sum(hits.values())
+    return {
+        stage: hits[stage] / total if total else 0.0
+        for stage in PREFILTER_STAGES}
+
+
+def histogram_excess(hist1: np.ndarray, hist2: np.ndarray) -> float:
+    bins = hist1.shape[-1]
+    reach = -(-DIFF_LEVEL // (256 // bins))
+    lo, hi = np.triu_indices(bins)
+    near_lo = np.maximum(lo - reach, 0)
+    near_hi = np.minimum(hi + reach + 1, bins)
+    excess = np.zeros(hist1.shape[:-1])
+    for src, dst in ((hist1, hist2), (hist2, hist1)):
+        csrc = np.pad(np.cumsum(src, axis=-1), [(0, 0), (1, 0)])
+        cdst = np.pad(np.cumsum(dst, axis=-1), [(0, 0), (1, 0)])
+        deficit = (
+            (csrc[:, hi + 1] - csrc[:, lo])
+            - (cdst[:, near_hi] - cdst[:, near_lo]))
+        excess = np.maximum(excess, deficit.max(axis=-1))
+    return float(excess.sum())
+
+
+def to_luminance(
+    imarr: np.ndarray, scale: int = 1, arrays: BufferPool = None
+) -> np.ndarray:
+    h, w = imarr.shape[:2]
+    if imarr.ndim == 3:
+        code = cv2.COLOR_RGBA2GRAY if imarr.shape[2] == 4 \
+            else cv2.COLOR_RGB2GRAY
+        dst = arrays.take((h, w)) if arrays is not None else None
+        gray = cv2.cvtColor(imarr, code, dst=dst)
+    else:
+        gray = imarr
+    if scale > 1:
+        size = (max(1, w // scale), max(1, h // scale))
+        dst = arrays.take(size[::-1]) if arrays is not None else None
+        small = cv2.resize(gray, size, dst=dst, interpolation=cv2.INTER_AREA)
+        if arrays is not None and gray is not imarr:
+            arrays.give(gray)
+        gray = small
+    return np.ascontiguousarray(gray)
+
+
+def bounding_rect(rects: list[Rectangle]) -> Rectangle:
+    rects = list(rects)
+    x1 = min(rect.x for rect in rects)
+    y1 = min(rect.y for rect in rects)
+    x2 = max(rect.x + rect.w for rect in rects)
+    y2 = max(rect.y + rect.h for rect in rects)
+    return Rectangle(x1, y1, x2 - x1, y2 - y1)
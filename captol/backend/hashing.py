@@ -0,0 +1,132 @@
+from __future__ import annotations
+from datetime import date
+import os
+
+import cv2
+import numpy as np
+
+from captol.backend.data import Environment
+
+
+INDEX_DIR = '.captol'
+INDEX_HASH_SIZE = 16
+INDEX_SCALE = 8
+INDEX_CANDIDATES = 4
+N_WORDS = INDEX_HASH_SIZE**2 // 64
+HASH_DIGITS = INDEX_HASH_SIZE**2 // 4
+
+
+def dhash(gray: np.ndarray, size: int = 8) -> int:
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = small[..., :3].mean(axis=2)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(hashes: np.ndarray, hash_: int) -> np.ndarray:
+    words = _to_words(hash_, hashes.shape[1] if hashes.ndim == 2 else 1)
+    xor = np.bitwise_xor(hashes.reshape(len(hashes), -1), words)
+    return np.unpackbits(xor.view(np.uint8), axis=1).sum(axis=1)
+
+
+def _to_words(hash_: int, n_words: int) -> np.ndarray:
+    data = hash_.to_bytes(8 * n_words, 'big')
+    return np.frombuffer(data, dtype='>u8').astype(np.uint64)
+
+
+class HashIndex:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+        self.basedir = None
+        self.session = None
+        self.hashes = np.zeros((0, N_WORDS), dtype=np.uint64)
+        self.names = list()
+        self.planes = list()
+
+    @property
+    def filepath(self) -> str:
+        return os.path.join(
+            self.basedir, INDEX_DIR, f'hashes_{self.session}.txt')
+
+    def set_dir(self, basedir: str) -> None:
+        session = format(date.today())
+        if basedir == self.basedir and session == self.session:
+            return
+        self.basedir = basedir
+        self.session = session
+        self._load()
+
+    def add(self, hash_: int, path: str, plane: np.ndarray = None) -> None:
+        self.set_dir(os.path.dirname(path))
+        name = os.path.basename(path)
+        self.hashes = np.concatenate(
+            [self.hashes, _to_words(hash_, N_WORDS)[None]])
+        self.names.append(name)
+        self.planes.append(plane)
+        try:
+            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+            with open(self.filepath, 'a') as f:
+                f.write(f'{hash_:0{HASH_DIGITS}x} {name}\n')
+        except OSError:
+            pass
+
+    def lookup(self, hash_: int) -> list[tuple[str, np.ndarray | None]]:
+        # Only the nearest few entries are returned; on plain slides many
+        # hashes are close and each candidate costs a comparison.
+        if self.basedir is None or not self.names:
+            return list()
+        dist = hamming(self.hashes, hash_)
+        hits = np.flatnonzero(dist <= self.env.hash_distance_threshold)
+        hits = hits[np.argsort(dist[hits], kind='stable')][:INDEX_CANDIDATES]
+        return [
+            (os.path.join(self.basedir, self.names[i]), self.planes[i])
+            for i in hits]
+
+    def set_plane(self, path: str, plane: np.ndarray) -> None:
+        name = os.path.basename(path)
+        if os.path.dirname(path) != self.basedir or name not in self.names:
+            return
+        self.planes[self.names.index(name)] = plane
+
+    def discard(self, path: str) -> None:
+        name = os.path.basename(path)
+        if os.path.dirname(path) != self.basedir or name not in self.names:
+            return
+        keep = [i for i, n in enumerate(self.names) if n != name]
+        self.hashes = self.hashes[keep]
+        self.names = [self.names[i] for i in keep]
+        self.planes = [self.planes[i] for i in keep]
+        self._dump()
+
+    def _load(self) -> None:
+        # Planes are not stored; entries from an earlier run get theirs
+        # from the saved file the first time they are a candidate.
+        hashes, names = list(), list()
+        try:
+            with open(self.filepath, 'r') as f:
+                for line in f:
+                    hexhash, _, name = line.rstrip('\n').partition(' ')
+                    if len(hexhash) != HASH_DIGITS:
+                        continue
+                    try:
+                        hashes.append(_to_words(int(hexhash, 16), N_WORDS))
+                    except ValueError:
+                        continue
+                    names.append(name)
+        except OSError:
+            pass
+        self.hashes = np.array(hashes, dtype=np.uint64).reshape(-1, N_WORDS)
+        self.names = names
+        self.planes = [None] * len(names)
+
+    def _dump(self) -> None:
+        try:
+            with open(self.filepath, 'w') as f:
+                for words, name in zip(self.hashes, self.names):
+                    hash_ = int.from_bytes(
+                        words.astype('>u8').tobytes(), 'big')
+                    f.write(f'{hash_:0{HASH_DIGITS}x} {name}\n')
+        except OSError:
+            pass
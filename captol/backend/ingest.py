@@ -0,0 +1,87 @@
+from __future__ import annotations
+from copy import copy
+import os
+from time import monotonic
+from typing import Callable
+
+import numpy as np
+
+from captol.backend.data import Environment, Rectangle
+from captol.backend.extraction import ImageBuffer, ImageCounter
+from captol.backend.source import VideoSource
+
+
+class VideoIngester:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+
+    def run(
+        self, path: str, output: str, area: Rectangle = None,
+        name: str = None, progress: Callable[[int, int], None] = None
+    ) -> dict[str, float]:
+        # Settling is measured in video time, so sampling never sleeps and
+        # is bounded by a frame budget instead of the wall clock.
+        env = copy(self.env)
+        env.settle_interval = 0
+        env.settle_timeout = float('inf')
+
+        source = VideoSource(path, seek_frames=self.env.ingest_seek_frames)
+        fps = source.video_fps or 30.0
+        n_frames = source.frame_count
+        step = max(1, round(fps * self.env.ingest_sample_interval))
+        fine = max(1, round(fps * self.env.settle_interval))
+        budget = max(1, round(fps * self.env.settle_timeout / fine))
+        bbox = None
+        if area is not None:
+            bbox = (area.x, area.y, area.x + area.w, area.y + area.h)
+
+        os.makedirs(output, exist_ok=True)
+        counter = ImageCounter(env)
+        counter.set_dir(output)
+        counter.initialize_count()
+        counter.new_session(os.path.abspath(path))
+        imbuffer = ImageBuffer(env)
+        imbuffer.set_dir(output)
+        if area is not None:
+            imbuffer.reserve(area)
+
+        pos = cursor = 0
+        n_samples = n_saved = 0
+
+        def refine() -> np.ndarray | None:
+            nonlocal cursor, n_left, n_samples
+            if n_left <= 0:
+                return None
+            n_left -= 1
+            cursor += fine
+            n_samples += 1
+            return source.read_at(cursor, bbox)
+
+        start = monotonic()
+        try:
+            while True:
+                frame = source.read_at(pos, bbox)
+                if frame is None:
+                    break
+                n_samples += 1
+                cursor, n_left = pos, budget
+                imbuffer.hold(frame)
+                if imbuffer.check_new(refine):
+                    path = counter.next_savepath()
+                    counter.register(path, name, imbuffer.save(path), area)
+                    counter.up(1)
+                    n_saved += 1
+                pos = cursor + step
+                if progress is not None:
+                    progress(min(pos, n_frames), n_frames)
+        finally:
+            imbuffer.flush()
+            source.close()
+
+        elapsed = max(monotonic() - start, 1e-9)
+        duration = min(pos, n_frames) / fps
+        return {
+            'duration': duration, 'elapsed': elapsed,
+            'speed': duration / elapsed, 'samples': n_samples,
+            'saved': n_saved}
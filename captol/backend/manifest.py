@@ -0,0 +1,159 @@
+from __future__ import annotations
+from collections import Counter
+from datetime import datetime
+import json
+import os
+import re
+
+from captol.backend.hashing import INDEX_DIR
+from captol.utils.const import CAPTURE_FORMATS
+
+
+NAME_PATTERN = re.compile(
+    r'(\d{4}-\d{2}-\d{2})_(\d+)\.(' + '|'.join(CAPTURE_FORMATS) + ')$',
+    re.IGNORECASE)
+
+
+class CaptureManifest:
+
+    def __init__(self, basedir: str) -> None:
+        self.basedir = basedir
+        self.entries = dict()
+        self.counts = Counter()
+        self.lastnums = dict()
+
+        self.load()
+
+    @property
+    def filepath(self) -> str:
+        return os.path.join(self.basedir, INDEX_DIR, 'manifest.jsonl')
+
+    @property
+    def total(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def count(self, date: str) -> int:
+        return self.counts[date]
+
+    def lastnum(self, date: str) -> int:
+        return self.lastnums.get(date, 0)
+
+    def load(self) -> None:
+        self._clear()
+        try:
+            with open(self.filepath, 'r') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue
+        except FileNotFoundError:
+            self.rebuild()
+            return
+        if self._is_stale():
+            self.prune()
+
+    def rebuild(self) -> None:
+        self._clear()
+        self._write(self._scan(), mode='w')
+
+    def reconcile(self) -> None:
+        self._write(self._scan())
+
+    def prune(self) -> None:
+        # Captures can be deleted behind our back (a merge packing them into
+        # a zip, a file manager), so a rescan also drops the missing ones.
+        # Not part of reconcile: a capture may still sit in the writer queue.
+        names = set(self._listdir())
+        records = [
+            {'name': name, 'deleted': True}
+            for name in self.entries if name not in names]
+        for record in records:
+            self._apply(record)
+        self._write(records + self._scan(names))
+        try:
+            os.utime(self.filepath)
+        except OSError:
+            pass
+
+    def _is_stale(self) -> bool:
+        # Adding or removing a file touches the folder, so a folder newer
+        # than its manifest may hold files the manifest does not know of.
+        try:
+            return os.stat(self.basedir).st_mtime \
+                >= os.stat(self.filepath).st_mtime
+        except FileNotFoundError:
+            return False
+
+    def _listdir(self) -> list[str]:
+        try:
+            return os.listdir(self.basedir)
+        except FileNotFoundError:
+            return list()
+
+    def _scan(self, names: set[str] = None) -> list[dict]:
+        records = list()
+        if names is None:
+            names = self._listdir()
+        for name in names:
+            match = NAME_PATTERN.match(name)
+            if match is None or name in self.entries:
+                continue
+            date, num, _ = match.groups()
+            record = {'name': name, 'date': date, 'num': int(num)}
+            records.append(record)
+            self._apply(record)
+        return records
+
+    def append(
+        self, name: str, area: str = None, size: tuple[int] = None,
+        hash_: int = None) -> None:
+        match = NAME_PATTERN.match(name)
+        if match is None:
+            return
+        date, num, _ = match.groups()
+        record = {
+            'name': name, 'date': date, 'num': int(num),
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'area': area, 'size': size,
+            'hash': None if hash_ is None else f'{hash_:016x}'}
+        self._apply(record)
+        self._write([record])
+
+    def remove(self, name: str) -> None:
+        if name not in self.entries:
+            return
+        record = {'name': name, 'deleted': True}
+        self._apply(record)
+        self._write([record])
+
+    def _clear(self) -> None:
+        self.entries = dict()
+        self.counts = Counter()
+        self.lastnums = dict()
+
+    def _apply(self, record: dict) -> None:
+        name = record['name']
+        if record.get('deleted'):
+            entry = self.entries.pop(name, None)
+            if entry is not None:
+                self.counts[entry['date']] -= 1
+            return
+        if name in self.entries:
+            return
+        date, num = record['date'], record['num']
+        self.entries[name] = record
+        self.counts[date] += 1
+        self.lastnums[date] = max(self.lastnums.get(date, 0), num)
+
+    def _write(self, records: list[dict], mode: str = 'a') -> None:
+        try:
+            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+            with open(self.filepath, mode) as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+        except OSError:
+            pass
@@ -1,87 +1,254 @@
 from __future__ import annotations
+from collections import deque
+from concurrent.futures import (
+    Executor, ProcessPoolExecutor, ThreadPoolExecutor)
+from contextlib import nullcontext
+from functools import partial
 import io
+from itertools import islice
 import os
-from zipfile import ZipFile, ZIP_DEFLATED
+from tempfile import TemporaryDirectory
+from typing import Callable, Iterator
+import zlib
+from zipfile import (
+    BadZipFile, ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED)
 from PIL import Image
 
 import img2pdf
+import numpy as np
 import pikepdf
 
 from captol.backend.data import Environment
+from captol.backend.dedup import (
+    PageDeduplicator, load_page_features, page_features)
+from captol.backend.pagecache import PageCache, lookup, page_path, store
+
+
+# Formats whose data is compressed already; deflating them gains nothing.
+ARCHIVE_STORED_EXTS = ('.png', '.webp', '.jpg', '.jpeg')
 
 
 class PdfConverter:
 
     def __init__(self, env: Environment):
         self.env = env
+        self.cache = PageCache(env)
+        self.removed = dict()
 
-    def save_as_pdf(self, image_paths: tuple[str], savepath: str) -> None:
+    def save_as_pdf(
+        self, image_paths: tuple[str], savepath: str,
+        progress: Callable[[int, int], None] = None, append: bool = None
+    ) -> None:
         savedir, savename = os.path.split(savepath)
         savename_noext = os.path.splitext(savename)[0]
+        if append is None:
+            append = self.env.pdf_append
+        append = append and os.path.isfile(savepath)
+        if append and PassLock(self.env).check_encryption(savepath):
+            raise Exception(
+                f'"{savename}" is password protected. '
+                'Unlock it before adding pages.')
 
         zip_dir = os.path.join(savedir, 'archives')
-        pdf = self._fetch_images_as_pdf(image_paths)
-        self._dump_in_pdf(pdf, savedir, savename_noext)
+        with self._open_executor() as executor:
+            pages = self._prepare_pages(image_paths, executor, progress)
+            if self.env.pdf_streaming:
+                self._stream_images_to_pdf(pages, savepath, append)
+            else:
+                pdf = self._fetch_images_as_pdf(pages)
+                self._dump_in_pdf(pdf, savepath, append)
+        if self.cache.enabled:
+            self.cache.evict()
         if self.env.zip_converted_images:
-            self._pack_usedimages_into_zip(image_paths, zip_dir, savename_noext)
+            self._pack_usedimages_into_zip(
+                image_paths, zip_dir, savename_noext, append)
 
-    def _fetch_images_as_pdf(self, image_paths: list[str]) -> bytes:
+    def _open_executor(self) -> Executor | nullcontext:
+        workers = self.env.pdf_workers or os.cpu_count() or 1
         do_compress = self.env.compress_before_pdf_conversion
-        quality = self.env.compression_ratio
         do_resize = self.env.resize_before_pdf_conversion
-        height = self.env.resized_height
+        do_dedup = self.env.pdf_dedup_pages
+        if workers <= 1 or not (do_compress or do_resize or do_dedup):
+            return nullcontext()
+        return ProcessPoolExecutor(workers)
 
-        images = list()
-        for path in image_paths:
-            try:
-                image = Image.open(path)
-                if do_resize:
-                    image = self._resize(image, height)
-                if do_compress:
-                    image = self._compress(image, quality)
-                images.append(image)
-            except FileNotFoundError:
-                pass
+    def _prepare_pages(
+        self, image_paths: list[str], executor: Executor | None,
+        progress: Callable[[int, int], None] | None
+    ) -> Iterator[list[bytes | str]]:
+        # Pages are prepared one chunk at a time so that no more than two
+        # chunks of encoded images are held, and map keeps them in order.
+        dedup = PageDeduplicator(self.env)
+        self.removed = dedup.removed
+        height = quality = None
+        if self.env.resize_before_pdf_conversion:
+            height = self.env.resized_height
+        if self.env.compress_before_pdf_conversion:
+            quality = self.env.compression_ratio
+        dedup_scale = None
+        if self.env.pdf_dedup_pages:
+            dedup_scale = max(1, self.env.dedup_scale)
+        func = partial(
+            prepare_page, height=height, quality=quality,
+            cache_dir=self.cache.folder, dedup_scale=dedup_scale)
+        chunk_size = max(1, self.env.pdf_chunk_size)
+        if not self.env.pdf_streaming:
+            chunk_size = max(1, len(image_paths))
+
+        def submit(chunk: list[str]) -> Iterator[tuple]:
+            if executor is None:
+                return map(func, chunk)
+            return executor.map(func, chunk)
 
-        return img2pdf.convert(images)
+        total = len(image_paths)
+        done = 0
+        if progress is not None:
+            progress(done, total)
+        chunks = [
+            image_paths[i:i+chunk_size] for i in range(0, total, chunk_size)]
+        results = submit(chunks[0]) if chunks else iter(())
+        for i in range(len(chunks)):
+            pages = list()
+            for path, (page, features) in zip(chunks[i], results):
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+                if page is None:
+                    continue
+                if features is not None and dedup.is_duplicate(
+                        path, *features):
+                    continue
+                pages.append(page)
+            # The workers go on with the next chunk while this one is
+            # being written.
+            if i + 1 < len(chunks):
+                results = submit(chunks[i+1])
+            yield pages
 
-    def _resize(self, image: Image, height: int) -> Image:
-        ratio = height / image.height
-        width = round(image.width * ratio)
-        return image.resize((width, height), resample=Image.BICUBIC)
+    def _fetch_images_as_pdf(
+        self, pages: Iterator[list[bytes | str]]) -> bytes:
+        pages = [page for chunk in pages for page in chunk]
+        if not pages:
+            raise Exception('No images to convert.')
+        return img2pdf.convert(pages)
 
-    def _compress(self, image: Image, quality: int) -> Image:
-        buffer = io.BytesIO()
-        image.save(buffer, format="JPEG", quality=quality)
-        return buffer.getvalue()
+    def _stream_images_to_pdf(
+        self, pages: Iterator[list[bytes | str]], savepath: str,
+        append: bool
+    ) -> None:
+        savedir = os.path.dirname(os.path.abspath(savepath))
+        with TemporaryDirectory(dir=savedir, prefix='.captol-') as tmpdir:
+            parts = list()
+            for chunk in pages:
+                if not chunk:
+                    continue
+                part = os.path.join(tmpdir, f'{len(parts)}.pdf')
+                with open(part, 'wb') as f:
+                    img2pdf.convert(chunk, outputstream=f)
+                parts.append(part)
+            if not parts:
+                raise Exception('No images to convert.')
+            self._assemble_parts(parts, savepath, tmpdir, append)
 
-    def _dump_in_pdf(self, pdf: bytes, output_dir: str, basename: str) -> None:
-        output_path = os.path.join(output_dir, basename+'.pdf')
-        with open(output_path, 'ab') as f:
-            f.write(pdf)
+    def _assemble_parts(
+        self, parts: list[str], savepath: str, tmpdir: str, append: bool
+    ) -> None:
+        # The qpdf job copies page streams lazily from the part files while
+        # writing, unlike Pdf.pages.extend which loads them into memory.
+        # Appending keeps the existing file as the primary input, so its
+        # pages, outline and metadata are carried over as they are.
+        tmppath = os.path.join(tmpdir, 'merged.pdf')
+        if append:
+            base = [os.path.abspath(savepath), '--pages', '.']
+        elif len(parts) == 1:
+            os.replace(parts[0], savepath)
+            return
+        else:
+            base = ['--empty', '--pages']
+        pikepdf.Job(['pikepdf', *base, *parts, '--', tmppath]).run()
+        os.replace(tmppath, savepath)
+
+    def _dump_in_pdf(self, pdf: bytes, savepath: str, append: bool) -> None:
+        savedir = os.path.dirname(os.path.abspath(savepath))
+        with TemporaryDirectory(dir=savedir, prefix='.captol-') as tmpdir:
+            part = os.path.join(tmpdir, '0.pdf')
+            with open(part, 'wb') as f:
+                f.write(pdf)
+            self._assemble_parts([part], savepath, tmpdir, append)
 
     def _pack_usedimages_into_zip(
-        self, image_paths: list[str], output_dir: str, basename: str) -> None:
+        self, image_paths: list[str], output_dir: str, basename: str,
+        append: bool = False
+    ) -> None:
         output_path = os.path.join(output_dir, basename+'.zip')
         os.makedirs(output_dir, exist_ok=True)
 
-        self._create_zip(image_paths, output_path)
-        self._remove_packed_images(image_paths)
+        written = self._create_zip(image_paths, output_path, append)
+        self._remove_packed_images(self._verify_zip(output_path, written))
 
-    def _create_zip(self, image_paths: list[str], output_path: str):
-        if os.path.isfile(output_path):
+    def _create_zip(
+        self, image_paths: list[str], output_path: str, append: bool = False
+    ) -> dict[str, tuple[str, int, int]]:
+        # The archive of an appended pdf is extended along with it.
+        if not append and os.path.isfile(output_path):
             try:
                 os.remove(output_path)
             except FileNotFoundError:
                 pass
 
-        with ZipFile(output_path, 'a') as zf:
-            for path in image_paths:
+        # zipfile compresses in the writing thread, so the pool reads and
+        # checksums the next files while the current one is written.
+        written = dict()
+        workers = max(1, self.env.archive_workers)
+        with ZipFile(output_path, 'a') as zf, \
+                ThreadPoolExecutor(workers) as executor:
+            names = set(zf.namelist())
+            for path, data, crc in self._prefetch(
+                    image_paths, executor, 2*workers):
+                if data is None:
+                    continue
+                zinfo = ZipInfo.from_file(
+                    path, _unique_name(os.path.basename(path), names))
+                zinfo.compress_type = archive_compression(path)
+                with zf.open(zinfo, 'w') as f:
+                    f.write(data)
+                names.add(zinfo.filename)
+                written[zinfo.filename] = (path, crc, len(data))
+        return written
+
+    def _prefetch(
+        self, image_paths: list[str], executor: ThreadPoolExecutor,
+        depth: int
+    ) -> Iterator[tuple[str, bytes | None, int]]:
+        paths = iter(image_paths)
+        window = deque(
+            (path, executor.submit(read_for_archive, path))
+            for path in islice(paths, depth))
+        while window:
+            path, future = window.popleft()
+            for next_path in islice(paths, 1):
+                window.append(
+                    (next_path, executor.submit(read_for_archive, next_path)))
+            yield (path, *future.result())
+
+    def _verify_zip(
+        self, output_path: str, written: dict[str, tuple[str, int, int]]
+    ) -> list[str]:
+        verified = list()
+        with ZipFile(output_path) as zf:
+            for name, (path, crc, size) in written.items():
                 try:
-                    zf.write(
-                        path, os.path.basename(path), compress_type=ZIP_DEFLATED)
-                except FileNotFoundError:
-                    pass
+                    info = zf.getinfo(name)
+                    if info.CRC != crc or info.file_size != size:
+                        continue
+                    # Reading a member to the end checks its CRC.
+                    with zf.open(info) as f:
+                        while f.read(2**20):
+                            pass
+                except (KeyError, BadZipFile, OSError):
+                    continue
+                verified.append(path)
+        return verified
 
     def _remove_packed_images(self, image_paths: list[str]) -> None:
         for path in image_paths:
@@ -91,6 +258,91 @@ class PdfConverter:
                 pass
 
 
+def archive_compression(path: str) -> int:
+    ext = os.path.splitext(path)[1].lower()
+    return ZIP_STORED if ext in ARCHIVE_STORED_EXTS else ZIP_DEFLATED
+
+
+def read_for_archive(path: str) -> tuple[bytes | None, int]:
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None, 0
+    return data, zlib.crc32(data)
+
+
+def _unique_name(name: str, names: set[str]) -> str:
+    stem, ext = os.path.splitext(name)
+    i = 1
+    while name in names:
+        name = f'{stem} ({i}){ext}'
+        i += 1
+    return name
+
+
+def prepare_page(
+    path: str, height: int = None, quality: int = None,
+    cache_dir: str = None, dedup_scale: int = None
+) -> tuple[bytes | str | None, tuple[np.ndarray, np.ndarray] | None]:
+    if height is None and quality is None:
+        if not os.path.isfile(path):
+            return None, None
+        features = None
+        if dedup_scale is not None:
+            features = load_page_features(path, None, dedup_scale)
+        return path, features
+
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None, None
+    cached = None
+    if cache_dir is not None:
+        cached = page_path(cache_dir, data, height, quality)
+        if lookup(cached):
+            features = None
+            if dedup_scale is not None:
+                with Image.open(io.BytesIO(data)) as source:
+                    size = source.size
+                features = load_page_features(cached, size, dedup_scale)
+            return cached, features
+
+    with Image.open(io.BytesIO(data)) as image:
+        features = None
+        if dedup_scale is not None:
+            features = page_features(image, image.size, dedup_scale)
+        if height is not None:
+            image = _resize(image, height)
+        if quality is not None:
+            page = _compress(image, quality)
+        else:
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG')
+            page = buffer.getvalue()
+    if cached is not None:
+        try:
+            store(cached, page)
+        except OSError:
+            pass
+    return page, features
+
+
+def _resize(image: Image, height: int) -> Image:
+    ratio = height / image.height
+    width = round(image.width * ratio)
+    return image.resize((width, height), resample=Image.BICUBIC)
+
+
+def _compress(image: Image, quality: int) -> bytes:
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
 class PassLock:
 
     def __init__(self, env: Environment):
@@ -0,0 +1,71 @@
+from __future__ import annotations
+from hashlib import blake2b
+import os
+
+from captol.backend.data import Environment
+
+
+class PageCache:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+
+    @property
+    def enabled(self) -> bool:
+        return self.env.page_cache_size_mb > 0
+
+    @property
+    def folder(self) -> str | None:
+        return self.env.page_cache_dir if self.enabled else None
+
+    def evict(self) -> int:
+        # Least recently used pages go first; hits refresh the mtime.
+        limit = self.env.page_cache_size_mb * 2**20
+        entries = list()
+        for root, _, files in os.walk(self.env.page_cache_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(reverse=True)
+
+        total = freed = 0
+        for _, size, path in entries:
+            total += size
+            if total <= limit:
+                continue
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        return freed
+
+
+def page_path(
+    folder: str, data: bytes, height: int | None, quality: int | None
+) -> str:
+    key = blake2b(data, digest_size=20)
+    key.update(f'{height}:{quality}'.encode())
+    name = key.hexdigest()
+    ext = '.jpg' if quality is not None else '.png'
+    return os.path.join(folder, name[:2], name + ext)
+
+
+def lookup(path: str) -> bool:
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def store(path: str, page: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmppath = f'{path}.{os.getpid()}.tmp'
+    with open(tmppath, 'wb') as f:
+        f.write(page)
+    os.replace(tmppath, path)
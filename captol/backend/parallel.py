@@ -0,0 +1,110 @@
+from __future__ import annotations
+import atexit
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from multiprocessing.shared_memory import SharedMemory
+
+import cv2
+import numpy as np
+
+from captol.backend.data import Environment
+from captol.utils.const import DIFF_LEVEL
+
+
+HEADER = 64
+PARALLEL_MIN_PIXELS = 2_000_000
+
+_segments = dict()
+
+
+class DiffPool:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+        self.executor = None
+        self.shm = None
+        atexit.register(self.close)
+
+    def count(
+        self, gray1: np.ndarray, gray2: np.ndarray, scale: int,
+        ksize: int, sigma: float, limit: float
+    ) -> float:
+        h, w = gray1.shape
+        shm = self._reserve(HEADER + 2 * h * w)
+        flag = np.ndarray((1,), dtype=np.uint8, buffer=shm.buf)
+        np.ndarray((h, w), np.uint8, shm.buf, offset=HEADER)[:] = gray1
+        np.ndarray((h, w), np.uint8, shm.buf, offset=HEADER + h * w)[:] = gray2
+        flag[0] = 0
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.env.parallel_diff_workers)
+        tile = max(ksize, self.env.parallel_diff_tile)
+        futures = [
+            self.executor.submit(
+                count_band, shm.name, (h, w), y, min(h, y + tile),
+                ksize, sigma)
+            for y in range(0, h, tile)]
+
+        total = 0
+        try:
+            for future in as_completed(futures):
+                total += future.result()
+                if total * scale**2 > limit:
+                    break
+        finally:
+            flag[0] = 1
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            del flag
+        return float(total * scale**2)
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def _reserve(self, size: int) -> SharedMemory:
+        if self.shm is not None and self.shm.size >= size:
+            return self.shm
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+        self.shm = SharedMemory(create=True, size=size)
+        return self.shm
+
+
+def count_band(
+    name: str, shape: tuple[int, int], y1: int, y2: int,
+    ksize: int, sigma: float
+) -> int:
+    shm = _attach(name)
+    if shm.buf[0]:
+        return 0
+    h, w = shape
+    gray1 = np.ndarray(shape, np.uint8, shm.buf, offset=HEADER)
+    gray2 = np.ndarray(shape, np.uint8, shm.buf, offset=HEADER + h * w)
+
+    # Rows within half a kernel of the band are blurred along with it so
+    # that the band sees the same neighbours as the full frame would.
+    halo = ksize // 2
+    top, bottom = max(0, y1 - halo), min(h, y2 + halo)
+    dif = cv2.absdiff(gray1[top:bottom], gray2[top:bottom])
+    blr = cv2.GaussianBlur(dif, (ksize, ksize), sigma)
+    thr = cv2.threshold(
+        blr[y1 - top:y2 - top], DIFF_LEVEL, 255, cv2.THRESH_BINARY)[1]
+    return cv2.countNonZero(thr)
+
+
+def _attach(name: str) -> SharedMemory:
+    shm = _segments.get(name)
+    if shm is None:
+        for old in _segments.values():
+            old.close()
+        _segments.clear()
+        shm = _segments[name] = SharedMemory(name=name)
+    return shm
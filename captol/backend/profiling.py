@@ -0,0 +1,132 @@
+from __future__ import annotations
+from contextlib import nullcontext
+import csv
+import json
+import os
+from threading import Lock
+from time import perf_counter
+
+import numpy as np
+
+from captol.backend.data import Environment
+
+
+NULL_STAGE = nullcontext()
+SCORE = 'score'
+
+
+class Profiler:
+
+    def __init__(self, size: int = 4096) -> None:
+        self.enabled = False
+        self.lock = Lock()
+        self.size = None
+        self.names = None
+        self.ids = None
+        self.ticks = None
+        self.values = None
+        self.pos = 0
+        self.tick_id = 0
+
+        self.resize(size)
+
+    def configure(self, env: Environment) -> None:
+        if env.profiling_buffer_size != self.size:
+            self.resize(env.profiling_buffer_size)
+        self.enabled = env.profiling
+
+    def resize(self, size: int) -> None:
+        with self.lock:
+            self.size = max(1, size)
+            self.names = [SCORE]
+            self.ids = np.zeros(self.size, dtype=np.int16)
+            self.ticks = np.zeros(self.size, dtype=np.int64)
+            self.values = np.zeros(self.size, dtype=np.float64)
+            self.pos = 0
+            self.tick_id = 0
+
+    def clear(self) -> None:
+        self.resize(self.size)
+
+    def tick(self) -> None:
+        if self.enabled:
+            self.tick_id += 1
+
+    def stage(self, name: str) -> StageTimer | nullcontext:
+        if not self.enabled:
+            return NULL_STAGE
+        return StageTimer(self, name)
+
+    def score(self, value: float) -> None:
+        if self.enabled:
+            self.record(SCORE, value)
+
+    def record(self, name: str, value: float) -> None:
+        with self.lock:
+            try:
+                stage_id = self.names.index(name)
+            except ValueError:
+                stage_id = len(self.names)
+                self.names.append(name)
+            i = self.pos % self.size
+            self.ids[i] = stage_id
+            self.ticks[i] = self.tick_id
+            self.values[i] = value
+            self.pos += 1
+
+    def rows(self) -> list[tuple[int, str, float]]:
+        with self.lock:
+            n = min(self.pos, self.size)
+            order = np.arange(self.pos - n, self.pos) % self.size
+            return [
+                (int(self.ticks[i]), self.names[self.ids[i]],
+                 float(self.values[i])) for i in order]
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self.lock:
+            n = min(self.pos, self.size)
+            ids, values = self.ids[:n], self.values[:n]
+            names = list(self.names)
+
+        summary = dict()
+        for stage_id, name in enumerate(names):
+            vals = values[ids == stage_id]
+            if not len(vals):
+                continue
+            p50, p95, p99 = np.percentile(vals, [50, 95, 99])
+            summary[name] = {
+                'count': len(vals), 'mean': float(vals.mean()),
+                'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+        return summary
+
+    def export(self, path: str) -> None:
+        rows = self.rows()
+        if os.path.splitext(path)[1].lower() == '.csv':
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['tick', 'stage', 'value'])
+                writer.writerows(rows)
+        else:
+            with open(path, 'w') as f:
+                for tick, stage, value in rows:
+                    f.write(json.dumps(
+                        {'tick': tick, 'stage': stage, 'value': value}))
+                    f.write('\n')
+
+
+class StageTimer:
+
+    def __init__(self, profiler: Profiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+
+    def __enter__(self) -> StageTimer:
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.profiler.record(self.name, (perf_counter() - self.start) * 1000)
+
+
+PROFILER = Profiler()
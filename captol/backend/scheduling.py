@@ -0,0 +1,80 @@
+from __future__ import annotations
+from collections import deque
+from threading import Event
+from time import monotonic
+
+import numpy as np
+
+from captol.backend.data import Environment
+
+
+class TickScheduler:
+
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+        self.stopped = Event()
+        self.jitters = deque(maxlen=1000)
+        self.interval = None
+        self.due = None
+        self.ticks = 0
+        self.missed = 0
+
+        self.reset()
+
+    @property
+    def min_interval(self) -> float:
+        return self.env.auto_clip_interval
+
+    @property
+    def max_interval(self) -> float:
+        return max(self.env.auto_clip_max_interval, self.min_interval)
+
+    def reset(self) -> None:
+        self.stopped.clear()
+        self.jitters.clear()
+        self.interval = self.min_interval
+        self.due = None
+        self.ticks = 0
+        self.missed = 0
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def wait(self) -> bool:
+        now = monotonic()
+        if self.due is None:
+            self.due = now
+        else:
+            self.due += self.interval
+            late = now - self.due
+            if late > 0:
+                skipped = int(late // self.interval)
+                self.missed += skipped
+                self.due += skipped * self.interval
+            elif self.stopped.wait(-late):
+                return False
+        if self.stopped.is_set():
+            return False
+        self.jitters.append(monotonic() - self.due)
+        self.ticks += 1
+        return True
+
+    def feed(self, changed: bool) -> None:
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(
+                self.interval * self.env.auto_clip_backoff, self.max_interval)
+
+    def stats(self) -> dict:
+        jitters = np.array(self.jitters) * 1000
+        if not len(jitters):
+            jitters = np.zeros(1)
+        return {
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'interval': self.interval,
+            'jitter_mean_ms': float(jitters.mean()),
+            'jitter_p95_ms': float(np.percentile(jitters, 95)),
+            'jitter_max_ms': float(jitters.max()),
+        }
@@ -0,0 +1,166 @@
+from __future__ import annotations
+import os
+import re
+from time import monotonic, perf_counter, sleep
+from PIL import Image, ImageGrab
+
+import cv2
+import numpy as np
+
+from captol.utils.const import IMAGE_EXTS
+
+
+class FrameSource:
+
+    def grab(self, bbox: tuple[int] | None = None) -> Image | None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ScreenSource(FrameSource):
+
+    def grab(self, bbox: tuple[int] | None = None) -> Image:
+        return ImageGrab.grab(bbox=bbox, all_screens=True)
+
+
+class ReplaySource(FrameSource):
+
+    def __init__(self, fps: float = 0.0) -> None:
+        self.fps = fps
+        self.due = None
+
+    def grab(self, bbox: tuple[int] | None = None) -> Image | None:
+        self._wait()
+        image = self._next()
+        if image is None:
+            return None
+        if bbox is not None:
+            image = image.crop(bbox)
+        return image
+
+    def _next(self) -> Image | None:
+        raise NotImplementedError
+
+    def _wait(self) -> None:
+        if self.fps <= 0:
+            return
+        now = monotonic()
+        if self.due is not None and self.due > now:
+            sleep(self.due - now)
+            now = self.due
+        self.due = now + 1 / self.fps
+
+
+class DirectorySource(ReplaySource):
+
+    def __init__(self, directory: str, fps: float = 0.0) -> None:
+        super().__init__(fps)
+        names = [
+            name for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTS)]
+        self.paths = [
+            os.path.join(directory, name)
+            for name in sorted(names, key=natural_key)]
+        self.pos = 0
+
+    def _next(self) -> Image | None:
+        if self.pos >= len(self.paths):
+            return None
+        path = self.paths[self.pos]
+        self.pos += 1
+        with Image.open(path) as image:
+            return image.convert('RGB')
+
+
+class VideoSource(ReplaySource):
+
+    def __init__(
+        self, path: str, fps: float = 0.0, seek_frames: int = 300
+    ) -> None:
+        super().__init__(fps)
+        self.seek_frames = seek_frames
+        self.grab_cost = None
+        self.seek_cost = None
+        self.pos = 0
+        self.frame = None
+        cap = self.cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise Exception(f'Video "{path}" cannot be opened.')
+
+    @property
+    def video_fps(self) -> float:
+        return self.cap.get(cv2.CAP_PROP_FPS)
+
+    @property
+    def frame_count(self) -> int:
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def close(self) -> None:
+        self.cap.release()
+
+    def read_at(
+        self, index: int, bbox: tuple[int] | None = None
+    ) -> np.ndarray | None:
+        cap = self.cap
+        gap = index - self.pos
+        seek = gap < 0 or gap > self._seek_gap()
+        start = perf_counter()
+        if seek:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self.pos = index
+        while self.pos < index:
+            if not cap.grab():
+                return None
+            self.pos += 1
+        if not seek and gap > 0:
+            self.grab_cost = _ema(self.grab_cost, (perf_counter() - start) / gap)
+        ok, frame = cap.read(self.frame)
+        if not ok:
+            return None
+        self.frame = frame
+        if seek:
+            self.seek_cost = _ema(self.seek_cost, perf_counter() - start)
+        self.pos += 1
+        if bbox is not None:
+            x1, y1, x2, y2 = bbox
+            frame = frame[y1:y2, x1:x2]
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def _seek_gap(self) -> float:
+        # A seek restarts decoding from the preceding keyframe, so its cost
+        # grows with the keyframe interval. Both costs are measured on the
+        # fly; the first gap after grabbing starts is used to probe a seek.
+        if self.grab_cost is None:
+            return self.seek_frames
+        if self.seek_cost is None:
+            return 1
+        return self.seek_cost / max(self.grab_cost, 1e-6)
+
+    def _next(self) -> Image | None:
+        ok, frame = self.cap.read()
+        if not ok:
+            return None
+        self.pos += 1
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def _ema(average: float | None, value: float, alpha: float = 0.2) -> float:
+    if average is None:
+        return value
+    return average + alpha * (value - average)
+
+
+def natural_key(name: str) -> list:
+    return [int(s) if s.isdigit() else s for s in re.split(r'(\d+)', name)]
+
+
+def open_source(spec: str, fps: float = 0.0) -> FrameSource:
+    if spec == 'screen':
+        return ScreenSource()
+    if os.path.isdir(spec):
+        return DirectorySource(spec, fps)
+    if os.path.isfile(spec):
+        return VideoSource(spec, fps)
+    raise Exception(f'Frame source "{spec}" not found.')
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import io
+import os
+from queue import Queue
+from threading import Event, Lock, Thread
+from PIL import Image
+
+from captol.backend.profiling import PROFILER
+
+
+class ImageWriter:
+
+    def __init__(self, n_threads: int, maxsize: int) -> None:
+        self.q = Queue(maxsize=max(1, maxsize))
+        self.lock = Lock()
+        self.pending = dict()
+        self.cancelled = set()
+        self.errors = list()
+        self.threads = list()
+
+        for _ in range(n_threads):
+            thread = Thread(target=self._work, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, image: Image, path: str, **params) -> None:
+        done = Event()
+        with self.lock:
+            self.pending[path] = done
+        self.q.put((image, path, params, done))
+
+    def cancel(self, path: str) -> None:
+        with self.lock:
+            done = self.pending.get(path)
+            if done is None:
+                return
+            self.cancelled.add(path)
+        done.wait()
+
+    def flush(self) -> None:
+        self.q.join()
+        with self.lock:
+            errors, self.errors = self.errors, list()
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        for _ in self.threads:
+            self.q.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads.clear()
+
+    def _work(self) -> None:
+        while True:
+            item = self.q.get()
+            if item is None:
+                self.q.task_done()
+                return
+            image, path, params, done = item
+            try:
+                with self.lock:
+                    skip = path in self.cancelled
+                if not skip:
+                    write_image(image, path, **params)
+            except Exception as e:
+                with self.lock:
+                    self.errors.append(e)
+            finally:
+                with self.lock:
+                    del self.pending[path]
+                    self.cancelled.discard(path)
+                done.set()
+                self.q.task_done()
+
+
+def write_image(image: Image, path: str, **params) -> None:
+    ext = os.path.splitext(path)[1].lower()
+    buffer = io.BytesIO()
+    with PROFILER.stage('encode'):
+        image.save(buffer, format=Image.registered_extensions()[ext], **params)
+    with PROFILER.stage('write'):
+        with open(path, 'wb') as f:
+            f.write(buffer.getbuffer())
@@ -0,0 +1,126 @@
+from __future__ import annotations
+from dataclasses import fields
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter, process_time
+
+from captol.backend.data import Environment
+from captol.backend.extraction import Clipper, ImageBuffer, ImageCounter
+from captol.devel.synthetic import SessionSpec, SyntheticSession, SyntheticSource
+
+
+def default_env() -> Environment:
+    env = Environment()
+    for f in fields(Environment):
+        setattr(env, f.name, f.default)
+    return env
+
+
+def run_benchmark(env: Environment, spec: SessionSpec) -> dict[str, float]:
+    session = SyntheticSession(spec)
+    source = SyntheticSource(session)
+    clipper = Clipper(source)
+    saved = list()
+
+    # Each synthetic frame stands for one settle sample, so settling is
+    # bounded by a frame budget instead of wall time.
+    n_samples = round(env.settle_timeout / max(env.settle_interval, 1e-3))
+    settle_interval, env.settle_interval = env.settle_interval, 0
+    settle_timeout, env.settle_timeout = env.settle_timeout, float('inf')
+    capture_catalog, env.capture_catalog = env.capture_catalog, False
+
+    def clip_limited():
+        nonlocal n_left
+        if n_left <= 0:
+            return None
+        n_left -= 1
+        return clipper.clip()
+
+    try:
+        with TemporaryDirectory() as workdir:
+            counter = ImageCounter(env)
+            counter.set_dir(workdir)
+            counter.initialize_count()
+            imbuffer = ImageBuffer(env)
+            imbuffer.set_dir(workdir)
+
+            wall, cpu = perf_counter(), process_time()
+            while True:
+                image = clipper.clip()
+                if image is None:
+                    break
+                imbuffer.hold(image)
+                n_left = n_samples
+                if imbuffer.check_new(clip_limited):
+                    path = counter.next_savepath()
+                    counter.register(path, None, imbuffer.save(path))
+                    counter.up(1)
+                    saved.append(source.last_truth)
+            imbuffer.flush()
+            wall = perf_counter() - wall - source.wall_time
+            cpu = process_time() - cpu - source.cpu_time
+    finally:
+        env.settle_interval = settle_interval
+        env.settle_timeout = settle_timeout
+        env.capture_catalog = capture_catalog
+
+    n_frames = source.n_grabbed
+    captured = set()
+    n_transition = n_repeat = 0
+    for truth in saved:
+        if truth is None:
+            n_transition += 1
+        elif truth in captured:
+            n_repeat += 1
+        else:
+            captured.add(truth)
+
+    n_slides = len(set(session.order))
+    return {
+        'frames': n_frames,
+        'saved': len(saved),
+        'fps': n_frames / max(wall, 1e-9),
+        'cpu_ms_per_frame': cpu / max(n_frames, 1) * 1000,
+        'peak_memory_mb': peak_memory_mb(),
+        'precision': len(captured) / len(saved) if saved else 0.0,
+        'recall': len(captured) / n_slides,
+        'transition_saves': n_transition,
+        'repeated_saves': n_repeat,
+        'missed_slides': n_slides - len(captured),
+        'settle_exhausted': imbuffer.settler.outcomes['exhausted'],
+        **{f'prefilter_{stage}': rate
+           for stage, rate in imbuffer.prefilter_stats().items()}}
+
+
+def peak_memory_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return _peak_memory_windows()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def _peak_memory_windows() -> float:
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(
+        ctypes.windll.kernel32.GetCurrentProcess(),
+        ctypes.byref(counters), counters.cb)
+    return counters.PeakWorkingSetSize / 2**20
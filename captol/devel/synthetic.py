@@ -0,0 +1,179 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from time import perf_counter, process_time
+from typing import Iterator
+from PIL import Image
+
+import cv2
+import numpy as np
+
+from captol.backend.source import ReplaySource
+
+
+TRANSITIONS = ('fade', 'wipe', 'cut')
+WORDS = (
+    'capture', 'lecture', 'matrix', 'vector', 'kernel', 'gradient', 'theorem',
+    'protocol', 'latency', 'network', 'sample', 'entropy', 'model', 'signal',
+    'design', 'review', 'summary', 'example', 'result', 'method', 'cluster',
+    'pipeline', 'budget', 'quarter', 'target', 'update', 'feature', 'memory')
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+@dataclass
+class SessionSpec:
+    n_slides: int = 12
+    width: int = 1280
+    height: int = 720
+    hold_frames: int = 8
+    transition_frames: int = 4
+    revisit_every: int = 5
+    jpeg_quality: int = 70
+    cursor: bool = True
+    video: bool = True
+    seed: int = 0
+
+
+class SyntheticSession:
+
+    def __init__(self, spec: SessionSpec) -> None:
+        self.spec = spec
+        self.order = self._build_order()
+
+    @property
+    def n_frames(self) -> int:
+        spec = self.spec
+        n_transitions = sum(
+            TRANSITIONS[i % len(TRANSITIONS)] != 'cut'
+            for i in range(1, len(self.order)))
+        return (
+            len(self.order) * spec.hold_frames
+            + n_transitions * spec.transition_frames)
+
+    def frames(self) -> Iterator[tuple[np.ndarray, int | None]]:
+        spec = self.spec
+        t = 0
+        prev = None
+        for i, slide_id in enumerate(self.order):
+            slide = render_slide(slide_id, spec)
+            if prev is not None:
+                kind = TRANSITIONS[i % len(TRANSITIONS)]
+                n = 0 if kind == 'cut' else spec.transition_frames
+                for k in range(n):
+                    alpha = (k + 1) / (n + 1)
+                    frame = transition(prev, slide, kind, alpha)
+                    yield self._decorate(frame, t), None
+                    t += 1
+            for _ in range(spec.hold_frames):
+                yield self._decorate(slide, t), slide_id
+                t += 1
+            prev = slide
+
+    def _build_order(self) -> list[int]:
+        spec = self.spec
+        order = list()
+        for i in range(spec.n_slides):
+            order.append(i)
+            if spec.revisit_every > 0 and i > 0 \
+                    and (i + 1) % spec.revisit_every == 0:
+                order += [i - 1, i]
+        return order
+
+    def _decorate(self, slide: np.ndarray, t: int) -> np.ndarray:
+        spec = self.spec
+        frame = slide.copy()
+        if spec.video:
+            draw_video(frame, t, spec)
+        if spec.cursor:
+            draw_cursor(frame, t, spec)
+        if spec.jpeg_quality > 0:
+            _, buf = cv2.imencode(
+                '.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, spec.jpeg_quality])
+            frame = cv2.imdecode(buf, cv2.IMREAD_UNCHANGED)
+        return frame
+
+
+class SyntheticSource(ReplaySource):
+
+    def __init__(self, session: SyntheticSession, fps: float = 0.0) -> None:
+        super().__init__(fps)
+        self.frames = session.frames()
+        self.last_truth = None
+        self.n_grabbed = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+    def _next(self) -> Image | None:
+        wall, cpu = perf_counter(), process_time()
+        try:
+            frame, self.last_truth = next(self.frames)
+            self.n_grabbed += 1
+            return Image.fromarray(frame)
+        except StopIteration:
+            return None
+        finally:
+            self.wall_time += perf_counter() - wall
+            self.cpu_time += process_time() - cpu
+
+
+def render_slide(slide_id: int, spec: SessionSpec) -> np.ndarray:
+    rng = np.random.default_rng((spec.seed, slide_id))
+    w, h = spec.width, spec.height
+    u = h / 720
+
+    slide = np.empty((h, w, 3), dtype=np.uint8)
+    slide[:] = rng.integers(225, 256, size=3)
+    slide[:int(110 * u)] = rng.integers(20, 120, size=3)
+
+    title = f'{slide_id + 1}. ' + ' '.join(rng.choice(WORDS, size=3))
+    cv2.putText(
+        slide, title.title(), (int(40 * u), int(75 * u)), FONT, 1.6 * u,
+        (255, 255, 255), max(1, int(3 * u)), cv2.LINE_AA)
+
+    n_lines = int(rng.integers(3, 7))
+    for i in range(n_lines):
+        line = '- ' + ' '.join(rng.choice(WORDS, size=int(rng.integers(2, 6))))
+        cv2.putText(
+            slide, line, (int(60 * u), int((180 + 70 * i) * u)), FONT,
+            1.0 * u, (30, 30, 30), max(1, int(2 * u)), cv2.LINE_AA)
+
+    bw, bh = int(w * 0.35), int(h * 0.4)
+    x, y = w - bw - int(40 * u), int(160 * u)
+    noise = rng.integers(0, 256, size=(6, 8, 3)).astype(np.uint8)
+    slide[y:y + bh, x:x + bw] = cv2.resize(
+        noise, (bw, bh), interpolation=cv2.INTER_CUBIC)
+    return slide
+
+
+def transition(
+    prev: np.ndarray, slide: np.ndarray, kind: str, alpha: float
+) -> np.ndarray:
+    if kind == 'fade':
+        return cv2.addWeighted(prev, 1 - alpha, slide, alpha, 0)
+    frame = prev.copy()
+    edge = int(slide.shape[1] * alpha)
+    frame[:, :edge] = slide[:, :edge]
+    return frame
+
+
+def draw_video(frame: np.ndarray, t: int, spec: SessionSpec) -> None:
+    h, w = frame.shape[:2]
+    vw, vh = w // 7, h // 7
+    x0, y0 = 20, h - vh - 20
+    region = frame[y0:y0 + vh, x0:x0 + vw]
+    region[:] = 40 + int(8 * np.sin(t / 3))
+
+    r = max(4, vh // 10)
+    span = max(1, vw - 2 * r)
+    pos = (t * 7) % (2 * span)
+    cx = r + (pos if pos < span else 2 * span - pos)
+    cy = vh // 2 + int((vh // 2 - r) * np.sin(t / 2))
+    cv2.circle(region, (cx, cy), r, (230, 180, 60), -1)
+
+
+def draw_cursor(frame: np.ndarray, t: int, spec: SessionSpec) -> None:
+    h, w = frame.shape[:2]
+    x = int(w * (0.5 + 0.4 * np.sin(t / 5)))
+    y = int(h * (0.5 + 0.4 * np.sin(t / 7 + 1)))
+    arrow = np.array(
+        [[0, 0], [0, 18], [5, 14], [9, 22], [12, 21], [8, 13], [14, 13]])
+    cv2.fillPoly(frame, [arrow + (x, y)], (0, 0, 0))
@@ -0,0 +1,351 @@
+from __future__ import annotations
+from argparse import Namespace
+from datetime import datetime, timedelta
+from getpass import getpass
+import json
+import os
+from time import monotonic
+
+from captol.backend.catalog import CaptureCatalog
+from captol.backend.data import AreaDB, Environment, Rectangle
+from captol.backend.dedup import BatchDeduplicator
+from captol.backend.extraction import Clipper, ImageBuffer, ImageCounter
+from captol.backend.ingest import VideoIngester
+from captol.backend.manifest import NAME_PATTERN
+from captol.backend.merging import PdfConverter, PassLock
+from captol.backend.profiling import PROFILER
+from captol.backend.scheduling import TickScheduler
+from captol.backend.source import DirectorySource, natural_key, open_source
+from captol.utils.path import append_ext
+
+
+def add_parsers(subparsers) -> None:
+    extract = subparsers.add_parser(
+        'extract', help='Capture screenshots without GUI.')
+    extract.add_argument(
+        '-s', '--source', default='screen',
+        help='"screen", a folder of images or a video file.')
+    extract.add_argument('-a', '--area', help='Area name registered in GUI.')
+    extract.add_argument(
+        '-r', '--rect', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'),
+        help='Area to capture.')
+    extract.add_argument('-o', '--output', help='Folder to save screenshots.')
+    extract.add_argument(
+        '--fps', type=float, default=0.0,
+        help='Replay rate of recorded sources (0: as fast as possible).')
+    extract.add_argument(
+        '-n', '--max-frames', type=int, help='Stop after N frames.')
+    extract.add_argument(
+        '--no-dedup', action='store_true', help='Save every frame.')
+    extract.add_argument(
+        '--profile', metavar='PATH',
+        help='Record per-stage timings and export them (.jsonl or .csv).')
+    extract.set_defaults(func=extract_cmd)
+
+    ingest = subparsers.add_parser(
+        'ingest', help='Extract slides from a recorded video.')
+    ingest.add_argument('video')
+    ingest.add_argument('-a', '--area', help='Area name registered in GUI.')
+    ingest.add_argument(
+        '-r', '--rect', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'),
+        help='Area of the video frame to capture.')
+    ingest.add_argument('-o', '--output', help='Folder to save screenshots.')
+    ingest.add_argument(
+        '--interval', type=float,
+        help='Seconds of video between samples (default: from settings).')
+    ingest.set_defaults(func=ingest_cmd)
+
+    dedup = subparsers.add_parser(
+        'dedup', help='Remove near-duplicate screenshots in a folder.')
+    dedup.add_argument('folder')
+    dedup.add_argument(
+        '--delete', action='store_true',
+        help='Delete duplicates instead of moving them to "duplicates".')
+    dedup.add_argument(
+        '--dry-run', action='store_true', help='Only list duplicates.')
+    dedup.set_defaults(func=dedup_cmd)
+
+    merge = subparsers.add_parser('merge', help='Convert images into a pdf.')
+    merge.add_argument(
+        'images', nargs='*',
+        help='Image files or folders of screenshots. '
+             'Without them, captures are selected from the catalog.')
+    merge.add_argument('-o', '--output', required=True, help='Pdf to save.')
+    merge.add_argument('-a', '--area', help='Catalog: captures of this area.')
+    merge.add_argument(
+        '--date', help='Catalog: day of captures (YYYY-MM-DD, default today).')
+    merge.add_argument(
+        '--at', metavar='HH:MM',
+        help='Catalog: the session running at this time of day.')
+    merge.add_argument('--session', type=int, help='Catalog: session id.')
+    merge.add_argument(
+        '-j', '--workers', type=int,
+        help='Processes preparing pages (0: one per CPU).')
+    merge.add_argument(
+        '--append', action='store_true',
+        help='Add the pages to the end of an existing pdf.')
+    merge.add_argument(
+        '--dedup', action='store_true',
+        help='Leave out pages that repeat an earlier page.')
+    merge.set_defaults(func=merge_cmd)
+
+    sessions = subparsers.add_parser(
+        'sessions', help='List capture sessions in the catalog.')
+    sessions.add_argument('--date', help='YYYY-MM-DD (default today).')
+    sessions.set_defaults(func=sessions_cmd)
+
+    lock = subparsers.add_parser(
+        'lock', help='Set or remove the password of a pdf.')
+    lock.add_argument('pdf')
+    lock.add_argument('-p', '--password')
+    lock.add_argument('-o', '--output', help='Defaults to overwriting input.')
+    lock.add_argument('-u', '--unlock', action='store_true')
+    lock.set_defaults(func=lock_cmd)
+
+    bench = subparsers.add_parser(
+        'bench', help='Measure extraction on a synthetic screen share.')
+    bench.add_argument('--slides', type=int, default=12)
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument(
+        '--size', type=int, nargs=2, default=(1280, 720), metavar=('W', 'H'))
+    bench.add_argument('--no-cursor', action='store_true')
+    bench.add_argument('--no-video', action='store_true')
+    bench.add_argument(
+        '--set', action='append', default=list(), metavar='NAME=VALUE',
+        help='Override a setting, e.g. --set pixel_difference_threshold=5000.')
+    bench.add_argument(
+        '--user-settings', action='store_true',
+        help='Start from saved settings instead of defaults.')
+    bench.add_argument('--json', metavar='PATH', help='Append result as json.')
+    bench.set_defaults(func=bench_cmd)
+
+
+def run(args: Namespace) -> None:
+    args.func(args)
+
+
+def extract_cmd(args: Namespace) -> None:
+    env = Environment()
+    source = open_source(args.source, args.fps)
+    is_live = args.source == 'screen'
+    if isinstance(source, DirectorySource):
+        env.settle_samples = 0
+    elif not is_live:
+        env.settle_interval = 0
+
+    clipper = Clipper(source)
+    if args.area is not None:
+        clipper.register(AreaDB(env).get(args.area))
+    elif args.rect is not None:
+        clipper.register(Rectangle(*args.rect))
+    elif is_live:
+        raise SystemExit('Specify --area or --rect to capture the screen.')
+
+    if args.profile is not None:
+        env.profiling = True
+    PROFILER.configure(env)
+
+    output = args.output or env.default_save_folder
+    os.makedirs(output, exist_ok=True)
+    counter = ImageCounter(env)
+    counter.set_dir(output)
+    counter.initialize_count()
+    counter.new_session(args.source)
+    imbuffer = ImageBuffer(env)
+    imbuffer.set_dir(output)
+    if clipper.area is not None:
+        imbuffer.reserve(clipper.area)
+    scheduler = TickScheduler(env) if is_live else None
+
+    n_frames = n_saved = 0
+    start = monotonic()
+    try:
+        while args.max_frames is None or n_frames < args.max_frames:
+            if scheduler is not None and not scheduler.wait():
+                break
+            PROFILER.tick()
+            image = clipper.clip()
+            if image is None:
+                break
+            n_frames += 1
+            imbuffer.hold(image)
+            saved = args.no_dedup or imbuffer.check_new(clipper.clip)
+            if saved:
+                path = counter.next_savepath()
+                counter.register(
+                    path, args.area, imbuffer.save(path), clipper.area)
+                counter.up(1)
+                n_saved += 1
+            if scheduler is not None:
+                scheduler.feed(saved)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        imbuffer.flush()
+        source.close()
+
+    elapsed = max(monotonic() - start, 1e-9)
+    print(
+        f'{n_frames} frames, {n_saved} saved in {elapsed:.1f} s '
+        f'({n_frames / elapsed:.1f} fps)')
+    if not args.no_dedup:
+        print('prefilter hit rate: ' + ', '.join(
+            f'{stage} {rate:.0%}'
+            for stage, rate in imbuffer.prefilter_stats().items()))
+    if args.profile is not None:
+        for name, stats in PROFILER.summary().items():
+            print(
+                f'{name:>8}: p50 {stats["p50"]:.2f}  p95 {stats["p95"]:.2f}  '
+                f'p99 {stats["p99"]:.2f}  (n={stats["count"]})')
+        PROFILER.export(args.profile)
+
+
+def ingest_cmd(args: Namespace) -> None:
+    env = Environment()
+    if args.interval is not None:
+        env.ingest_sample_interval = args.interval
+    area = None
+    if args.area is not None:
+        area = AreaDB(env).get(args.area)
+    elif args.rect is not None:
+        area = Rectangle(*args.rect)
+
+    def progress(pos: int, total: int) -> None:
+        print(f'\r{pos / max(total, 1):6.1%}', end='', flush=True)
+
+    output = args.output or env.default_save_folder
+    result = VideoIngester(env).run(
+        args.video, output, area, args.area, progress)
+    print(
+        f'\r{result["saved"]} saved from {result["duration"]:.0f} s of video '
+        f'in {result["elapsed"]:.1f} s ({result["speed"]:.1f}x realtime, '
+        f'{result["samples"]} samples)')
+
+
+def dedup_cmd(args: Namespace) -> None:
+    deduplicator = BatchDeduplicator(Environment())
+    if args.dry_run:
+        groups = deduplicator.find_duplicates(args.folder)
+    else:
+        groups = deduplicator.run(args.folder, delete=args.delete)
+
+    for kept, duplicates in groups.items():
+        names = ', '.join(os.path.basename(path) for path in duplicates)
+        print(f'{os.path.basename(kept)}: {names}')
+    n_duplicates = sum(len(duplicates) for duplicates in groups.values())
+    print(f'{n_duplicates} duplicates in {len(groups)} groups')
+
+
+def merge_cmd(args: Namespace) -> None:
+    env = Environment()
+    if not args.images:
+        image_paths = _query_catalog(env, args)
+        if not image_paths:
+            raise SystemExit('No captures found in the catalog.')
+    else:
+        image_paths = _expand_images(args.images)
+    if args.workers is not None:
+        env.pdf_workers = args.workers
+    if args.dedup:
+        env.pdf_dedup_pages = True
+
+    def progress(done: int, total: int) -> None:
+        print(f'\r{done}/{total} pages', end='', flush=True)
+
+    start = monotonic()
+    converter = PdfConverter(env)
+    converter.save_as_pdf(
+        image_paths, append_ext(args.output, '.pdf'), progress,
+        True if args.append else None)
+    print(f'\r{len(image_paths)} images in {monotonic() - start:.1f} s')
+    for removed, kept in converter.removed.items():
+        print(
+            f'  removed {os.path.basename(removed)} '
+            f'(same as {os.path.basename(kept)})')
+    if converter.removed:
+        print(f'{len(converter.removed)} duplicate pages removed')
+
+
+def sessions_cmd(args: Namespace) -> None:
+    catalog = CaptureCatalog(Environment())
+    for session in catalog.sessions(_parse_day(args.date)):
+        areas = ', '.join(session['areas']) or '-'
+        print(
+            f'{session["id"]:>5}  {session["started_at"]:%H:%M}-'
+            f'{session["ended_at"]:%H:%M}  {session["count"]:>4} captures  '
+            f'{areas}  ({session["source"]})')
+
+
+def lock_cmd(args: Namespace) -> None:
+    passlock = PassLock(Environment())
+    password = args.password or getpass('Password: ')
+    output = args.output or args.pdf
+    if args.unlock:
+        passlock.decrypt(args.pdf, output, password)
+    else:
+        passlock.encrypt(args.pdf, output, password)
+
+
+def bench_cmd(args: Namespace) -> None:
+    from captol.devel.benchmark import default_env, run_benchmark
+    from captol.devel.synthetic import SessionSpec
+
+    env = Environment() if args.user_settings else default_env()
+    for item in args.set:
+        name, _, value = item.partition('=')
+        if not hasattr(env, name):
+            raise SystemExit(f'Unknown setting "{name}".')
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+        setattr(env, name, value)
+
+    spec = SessionSpec(
+        n_slides=args.slides, width=args.size[0], height=args.size[1],
+        cursor=not args.no_cursor, video=not args.no_video, seed=args.seed)
+    result = run_benchmark(env, spec)
+    for name, value in result.items():
+        print(f'{name:>18}: {value:.3f}' if isinstance(value, float)
+              else f'{name:>18}: {value}')
+    if args.json is not None:
+        with open(args.json, 'a') as f:
+            f.write(json.dumps({'settings': args.set, **result}))
+            f.write('\n')
+
+
+def _query_catalog(env: Environment, args: Namespace) -> list[str]:
+    catalog = CaptureCatalog(env)
+    day = _parse_day(args.date)
+    session = args.session
+    if session is None and args.at is not None:
+        hour, minute = map(int, args.at.split(':'))
+        session = catalog.session_at(day.replace(hour=hour, minute=minute))
+        if session is None:
+            return list()
+    since = until = None
+    if session is None:
+        since, until = day, day + timedelta(1)
+    return catalog.query(args.area, session, since, until)
+
+
+def _parse_day(text: str | None) -> datetime:
+    if text is None:
+        day = datetime.now()
+    else:
+        day = datetime.strptime(text, '%Y-%m-%d')
+    return day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _expand_images(paths: list[str]) -> list[str]:
+    image_paths = list()
+    for path in paths:
+        if os.path.isdir(path):
+            names = [
+                name for name in os.listdir(path) if NAME_PATTERN.match(name)]
+            image_paths += [
+                os.path.join(path, name)
+                for name in sorted(names, key=natural_key)]
+        else:
+            image_paths.append(path)
+    return image_paths
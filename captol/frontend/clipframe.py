@@ -1,7 +1,8 @@
 from __future__ import annotations
+from collections import Counter
 from dataclasses import asdict
+import os
 from threading import Thread
-from time import sleep
 import tkinter as tk
 from tkinter import BOTH, DISABLED, NORMAL, CENTER
 from tkinter import messagebox
@@ -11,15 +12,21 @@ from win32api import EnumDisplayMonitors
 import ttkbootstrap as ttk
 
 from captol.utils.const import ICON_FILE
-from captol.utils.path import unique_str
+from captol.utils.path import safe_dirname, unique_str
 from captol.frontend.subframe import TransparentWindow
 from captol.backend.data import Rectangle
-from captol.backend.extraction import ImageBuffer
+from captol.backend.dedup import DUPLICATE_DIR
+from captol.backend.extraction import (
+    ImageBuffer, ImageCounter, MultiAreaCapture, MultiClipper, bounding_rect,
+    hit_rates)
+from captol.backend.hashing import INDEX_DIR
+from captol.backend.profiling import PROFILER
+from captol.backend.scheduling import TickScheduler
 
 if TYPE_CHECKING:
     from captol.frontend.extracttab import ExtractTab
     from captol.backend.data import AreaDB, Environment
-    from captol.backend.extraction import Clipper, ImageCounter
+    from captol.backend.extraction import Clipper
 
 
 def get_expanded_screen_info() -> tuple[int]:
@@ -50,6 +57,9 @@ class ClipFrame(ttk.Frame):
         self.var_clipmode = tk.IntVar()  # 1: manual, 2: auto
         self.var_areaname = tk.StringVar()
         self.imbuffer = ImageBuffer(env)
+        self.scheduler = TickScheduler(env)
+        self.areas = dict()
+        self.multicapture = None
         self.xparentwindow = TransparentWindow(parent=self)
         self._is_showingprev = False
 
@@ -58,9 +68,32 @@ class ClipFrame(ttk.Frame):
         self.block_widgets()
 
     def register_cliparea(self, name: str, rect: Rectangle) -> None:
-        self.clipper.register(rect)
-        self.var_areaname.set(name)
-        self.xparentwindow.resize(**asdict(rect))
+        self.register_clipareas({name: rect})
+
+    def register_clipareas(self, areas: dict[str, Rectangle]) -> None:
+        self.areas = dict(areas)
+        names = list(areas.keys())
+        if len(names) == 1:
+            self.clipper.register(areas[names[0]])
+            self.imbuffer.reserve(areas[names[0]])
+            self._set_multicapture(None)
+            self.var_areaname.set(names[0])
+        else:
+            self._set_multicapture(self._create_multicapture())
+            self.var_areaname.set(f"{names[0]} (+{len(names)-1})")
+        self.xparentwindow.resize(**asdict(bounding_rect(areas.values())))
+
+    def update_cliparea(
+        self, oldname: str, newname: str, newrect: Rectangle) -> None:
+        areas = {
+            name: rect for name, rect in self.areas.items() if name != oldname}
+        areas[newname] = newrect
+        self.register_clipareas(areas)
+
+    def set_dir(self, basedir: str) -> None:
+        self.imbuffer.set_dir(basedir)
+        if self.multicapture is not None:
+            self._set_multicapture(self._create_multicapture())
 
     def block_widgets(self) -> None:
         for widget in self.winfo_children():
@@ -76,10 +109,23 @@ class ClipFrame(ttk.Frame):
             except tk.TclError:
                 pass
 
+    def shutdown(self) -> None:
+        self.thread_alive = False
+        if self.thread is not None:
+            self.scheduler.stop()
+            self.thread.join()
+            self.thread = None
+        try:
+            self.imbuffer.close()
+        except Exception as e:
+            messagebox.showerror("Captol", e)
+        self._set_multicapture(None)
+        self.counter.close()
+
     def is_activated_byname(self, name: str) -> bool:
         if self.fold_button['state'] == DISABLED:
             return False
-        if self.var_areaname.get() == name:
+        if name in self.areas:
             return True
         return False
 
@@ -104,11 +150,19 @@ class ClipFrame(ttk.Frame):
     def _init_vars(self) -> None:
         self.var_clipmode.set(2)
         self.var_areaname.set("( Not set )")
+        self.areas = dict()
+        self._set_multicapture(None)
 
     def _on_camera_clicked(self) -> None:
-        if self.clipper.area is None:
+        if not self.areas:
             return
         self._normal_save()
+        # Manual captures are rare, so waiting for the write here costs
+        # little and reports a failed save right away.
+        try:
+            self._flush()
+        except Exception as e:
+            messagebox.showerror("Capture", e)
 
     def _on_fold_clicked(self) -> None:
         self.parent.hide()
@@ -140,12 +194,18 @@ class ClipFrame(ttk.Frame):
 
     def _start_autoclip(self) -> None:
         def _target():
-            while self.thread_alive:
-                self._noduplicate_save()
-                sleep(self.env.auto_clip_interval)
+            scheduler = self.scheduler
+            while self.thread_alive and scheduler.wait():
+                PROFILER.tick()
+                scheduler.feed(self._noduplicate_save())
 
         def _run_thread():
             self.thread_alive = True
+            self.scheduler.reset()
+            for imbuffer in self._imbuffers():
+                imbuffer.hits.clear()
+            self.counter.new_session()
+            PROFILER.configure(self.env)
             thread = self.thread = Thread(target=_target)
             thread.start()
 
@@ -162,23 +222,50 @@ class ClipFrame(ttk.Frame):
         if self.thread_alive:
             if self.thread is not None:
                 self.thread_alive = False
+                self.scheduler.stop()
                 self.thread.join()
                 self.thread = None
-            messagebox.showinfo("Autoclip", "Autoclip stopped.")
+            try:
+                self._flush()
+            except Exception as e:
+                messagebox.showerror("Autoclip", e)
+            stats = self.scheduler.stats()
+            rates = ', '.join(
+                f'{stage} {rate:.0%}'
+                for stage, rate in self._prefilter_stats().items())
+            messagebox.showinfo(
+                "Autoclip",
+                "Autoclip stopped.\n"
+                f"(Ticks: {stats['ticks']}, missed: {stats['missed']}, "
+                f"jitter p95: {stats['jitter_p95_ms']:.0f} ms)\n"
+                f"(Prefilter: {rates})")
             self.parent.release_widgets()
             self.area_button.state(['!disabled'])
 
     def _normal_save(self) -> None:
+        if self.multicapture is not None:
+            self._multi_save(check_duplication=False)
+            return
         self._extract()
         self._store()
 
-    def _noduplicate_save(self) -> None:
+    def _noduplicate_save(self) -> bool:
+        if self.multicapture is not None:
+            return self._multi_save(check_duplication=True)
         self._extract()
-        for i in range(self.env.image_duplication_check_steps):
-            if self.imbuffer.compare_similarity(i+1):
-                self.imbuffer.release()
-                return
+        if not self.imbuffer.check_new(self.clipper.clip):
+            return False
         self._store()
+        return True
+
+    def _multi_save(self, check_duplication: bool) -> bool:
+        self.xparentwindow.hide_all()
+        saved = self.multicapture.capture(check_duplication)
+        if not saved:
+            return False
+        self.xparentwindow.flash()
+        self.counter.up(len(saved))
+        return True
 
     def _extract(self) -> None:
         self.xparentwindow.hide_all()
@@ -187,10 +274,54 @@ class ClipFrame(ttk.Frame):
 
     def _store(self) -> None:
         name = self.counter.next_savepath()
-        self.imbuffer.save(name)
+        image = self.imbuffer.save(name)
+        self.counter.register(
+            name, self.var_areaname.get(), image, self.clipper.area)
         self.xparentwindow.flash()
         self.counter.up(1)
 
+    def _flush(self) -> None:
+        self.imbuffer.flush()
+        if self.multicapture is not None:
+            self.multicapture.flush()
+
+    def _imbuffers(self) -> list[ImageBuffer]:
+        imbuffers = [self.imbuffer]
+        if self.multicapture is not None:
+            imbuffers += self.multicapture.buffers.values()
+        return imbuffers
+
+    def _prefilter_stats(self) -> dict[str, float]:
+        hits = Counter()
+        for imbuffer in self._imbuffers():
+            hits.update(imbuffer.hits)
+        return hit_rates(hits)
+
+    def _set_multicapture(self, multicapture: MultiAreaCapture | None) -> None:
+        # The replaced capture still owns writer threads, maybe a process
+        # pool and catalog connections, so it is flushed and closed.
+        old, self.multicapture = self.multicapture, multicapture
+        if old is None:
+            return
+        try:
+            old.close()
+        except Exception as e:
+            messagebox.showerror("Capture", e)
+
+    def _create_multicapture(self) -> MultiAreaCapture:
+        clipper = MultiClipper(self.clipper.source)
+        multicapture = MultiAreaCapture(self.env, clipper)
+        # Area names are free text; the catalog keeps them as typed.
+        folders = [INDEX_DIR, DUPLICATE_DIR]
+        for name, rect in self.areas.items():
+            folder = unique_str(safe_dirname(name), folders)
+            folders.append(folder)
+            counter = ImageCounter(self.env, parent=self.counter)
+            counter.set_dir(os.path.join(self.counter.basedir, folder))
+            counter.initialize_count()
+            multicapture.add(name, rect, counter)
+        return multicapture
+
 
 class EditDialog(ttk.Frame):
 
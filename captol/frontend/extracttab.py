@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import asdict
 import tkinter as tk
-from tkinter import BOTH, DISABLED, NORMAL, CENTER, VERTICAL
+from tkinter import BOTH, DISABLED, NORMAL, CENTER, VERTICAL, EXTENDED
 from tkinter import filedialog, messagebox
 from typing import TYPE_CHECKING
 
@@ -36,8 +36,8 @@ class ExtractTab(ttk.Frame):
         self.var_clipmode = tk.IntVar()
         areadb = self.areadb = AreaDB(env)
         self.clipper = Clipper()
-        self.counter = ImageCounter(
-            'png', var_nimages_total, var_nimages_today)
+        self.counter = ImageCounter(env)
+        self.counter.bind(var_nimages_total, var_nimages_today)
         self.xparentwindow = TransparentWindow(parent=root)
 
         self._create_widgets()
@@ -81,7 +81,7 @@ class ExtractTab(ttk.Frame):
     def update_clipinfo(
         self, oldname: str, newname: str, newrect: Rectangle) -> None:
         if self.clipframe.is_activated_byname(oldname):
-            self.clipframe.register_cliparea(newname, newrect)
+            self.clipframe.update_cliparea(oldname, newname, newrect)
 
     def _create_widgets(self) -> None:
         frame1 = self.frame1 = ttk.Frame(self, height=370)
@@ -108,7 +108,7 @@ class ExtractTab(ttk.Frame):
         ttk.LabelFrame(
             frame1, text="Range").place(x=20, y=190, width=415, height=210)
         lb_areas = self.lb_areas = tk.Listbox(
-            frame1, listvariable=self.var_listitems)
+            frame1, listvariable=self.var_listitems, selectmode=EXTENDED)
         lb_areas.place(x=30, y=230, height=160, width=205)
         scrollbar = ttk.Scrollbar(
             frame1, orient=VERTICAL, command=lb_areas.yview)
@@ -183,17 +183,18 @@ class ExtractTab(ttk.Frame):
         EditDialog(parent=self, areadb=self.areadb, name=name)
 
     def _on_set_clicked(self) -> None:
-        name = self._get_one_lbselection()
-        if name is None:
+        names = self._get_lbselections()
+        if not names:
             return
-        rect = self.areadb.get(name)
-        self.clipframe.register_cliparea(name, rect)
+        areas = {name: self.areadb.get(name) for name in names}
+        self.clipframe.register_clipareas(areas)
         self.clipframe.release_widgets()
 
     def _reset_folder_info(self, folder: str) -> None:
         self.var_folder.set(shorten(folder, maxlen=4))
         self.counter.set_dir(folder)
         self.counter.initialize_count()
+        self.clipframe.set_dir(folder)
 
     def _reset_clip_areas(self, keys: list[str]) -> None:
         self.var_listitems.set(keys)
@@ -220,6 +221,9 @@ class ExtractTab(ttk.Frame):
         if len(idx):
             self.lb_areas.select_clear(idx[0])
 
+    def _get_lbselections(self) -> list[str]:
+        return [self.lb_areas.get(idx) for idx in self.lb_areas.curselection()]
+
     def _get_one_lbselection(self) -> str | None:
         idx = self.lb_areas.curselection()
         if idx == ():
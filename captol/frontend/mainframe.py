@@ -7,6 +7,7 @@ import ttkbootstrap as ttk
 from captol.frontend.extracttab import ExtractTab
 from captol.frontend.mergetab import MergeTab
 from captol.frontend.settingframe import SettingsWindow
+from captol.frontend.profileframe import ProfileWindow
 from captol.utils.const import ICON_FILE
 from captol.backend.data import Environment
 
@@ -22,6 +23,7 @@ class Application(ttk.Frame):
         super().__init__(root)
         self.root = root
         self.settingswindow = None
+        self.profilewindow = None
         self.env = Environment()
 
         self._setup_root()
@@ -46,6 +48,7 @@ class Application(ttk.Frame):
         self.root.attributes('-topmost', True)
         self.root.geometry(f"{SIZE_NORMAL}-0+10")
         self.root.resizable(False, False)
+        self.root.protocol('WM_DELETE_WINDOW', self._on_close)
         self.style = ttk.Style()
         self.style.theme_use(self.env.theme)
         self.root.deiconify()
@@ -54,19 +57,35 @@ class Application(ttk.Frame):
         note = self.note = ttk.Notebook(self)
         note.root = self
         note.place(x=0, y=4, relwidth=1, height=506)
-        note.add(ExtractTab(
-            note, parent=self, env=self.env), text="1. Extract")
+        extracttab = self.extracttab = ExtractTab(
+            note, parent=self, env=self.env)
+        note.add(extracttab, text="1. Extract")
         note.add(MergeTab(
             note, parent=self, env=self.env), text="2. Merge  ")
         ttk.Button(
             self, text="Settings", bootstyle='secondary-outline-button',
             command=self._on_settings_clicked).place(x=360, y=1, width=95)
+        ttk.Button(
+            self, text="Timings", bootstyle='secondary-outline-button',
+            command=self._on_timings_clicked).place(x=260, y=1, width=95)
         self.pack(fill=BOTH, expand=True)
 
+    def _on_close(self) -> None:
+        self.extracttab.clipframe.shutdown()
+        self.root.destroy()
+
     def _on_settings_clicked(self) -> None:
         if not self._has_opened_settingswindow():
             self.settingswindow = SettingsWindow(parent=self, env=self.env)
 
+    def _on_timings_clicked(self) -> None:
+        if not self._has_opened_profilewindow():
+            self.profilewindow = ProfileWindow(parent=self, env=self.env)
+
+    def _has_opened_profilewindow(self) -> bool:
+        return self.profilewindow is not None and \
+               self.profilewindow.root.winfo_exists()
+
     def _has_opened_settingswindow(self) -> bool:
         return self.settingswindow is not None and \
                self.settingswindow.root.winfo_exists()
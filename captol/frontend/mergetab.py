@@ -1,4 +1,5 @@
 from __future__ import annotations
+import os
 import tkinter as tk
 from tkinter import BOTH, DISABLED, NORMAL, CENTER
 from tkinter import filedialog, messagebox
@@ -7,7 +8,9 @@ from typing import TYPE_CHECKING
 import ttkbootstrap as ttk
 
 from captol.frontend.subframe import ProgressWindow
+from captol.utils.const import CAPTURE_FORMATS
 from captol.utils.path import append_ext, noext_basename, shorten
+from captol.backend.catalog import CaptureCatalog
 from captol.backend.merging import PdfConverter, PassLock
 
 if TYPE_CHECKING:
@@ -21,6 +24,7 @@ class MergeTab(ttk.Frame):
         self, root: tk.Tk, parent: Application, env: Environment) -> None:
         super().__init__(root)
         self.root = root
+        self.env = env
         self.image_paths = None
         self.pdf_path = None
         self.var_nimages_total = tk.IntVar()
@@ -71,6 +75,9 @@ class MergeTab(ttk.Frame):
         ttk.Label(
             self, textvariable=self.var_nimages_total,
             anchor=CENTER).place(x=200, y=100, width=200)
+        ttk.Button(
+            self, text="Last session", bootstyle='secondary-outline-button',
+            command=self._on_lastsession_clicked).place(x=20, y=155, width=120)
         ttk.Button(
             self, text="Convert",
             command=self._on_convert_clicked).place(x=150, y=155, width=160)
@@ -110,11 +117,32 @@ class MergeTab(ttk.Frame):
         self.pdf_path = None
 
     def _on_imagefolder_clicked(self) -> None:
+        patterns = ' '.join(f'*.{ext}' for ext in CAPTURE_FORMATS)
         images = filedialog.askopenfilenames(
-            title="Select Images", filetypes=[('png', '*.png')])
+            title="Select Images",
+            filetypes=[('images', patterns)] + [
+                (ext, f'*.{ext}') for ext in CAPTURE_FORMATS])
+        if not images:
+            return
+        self._set_images(images)
+
+    def _on_lastsession_clicked(self) -> None:
+        catalog = CaptureCatalog(self.env)
+        try:
+            session = catalog.last_session()
+            images = list()
+            if session is not None:
+                images = [
+                    path for path in catalog.query(session=session)
+                    if os.path.isfile(path)]
+        finally:
+            catalog.close()
         if not images:
+            messagebox.showinfo("Last session", "No captures found.")
             return
+        self._set_images(images)
 
+    def _set_images(self, images: list[str]) -> None:
         self.var_imagename_from.set(noext_basename(images[0]))
         if len(images) > 1:
             self.var_imagename_to.set(noext_basename(images[-1]))
@@ -127,18 +155,45 @@ class MergeTab(ttk.Frame):
         if self.image_paths is None:
             return
         savepath = filedialog.asksaveasfilename(
-            title="Save as", filetypes=[('pdf', '*.pdf')])
+            title="Save as", filetypes=[('pdf', '*.pdf')],
+            confirmoverwrite=False)
         if not savepath:
             return
         savepath = append_ext(savepath, '.pdf')
+        append = False
+        if os.path.isfile(savepath):
+            append = messagebox.askyesnocancel(
+                "PDF Conversion",
+                f"{os.path.basename(savepath)} already exists.\n"
+                "Add the pages to the end of it?\n"
+                "(Yes: append, No: replace)")
+            if append is None:
+                return
 
         self.block_widgets()
         with ProgressWindow(
             self, "PDF Conversion", "Packing images into a pdf...") as pb:
-            pb.during(self.converter.save_as_pdf, self.image_paths, savepath)
+            pb.during(
+                self.converter.save_as_pdf, self.image_paths, savepath,
+                pb.progress, append)
+            pb.after(self._show_removed_pages)
             pb.after(self._init_vars_conversion)
             pb.final(self.release_widgets)
 
+    def _show_removed_pages(self) -> None:
+        removed = self.converter.removed
+        if not removed:
+            return
+        lines = [
+            f"{noext_basename(path)} = {noext_basename(kept)}"
+            for path, kept in list(removed.items())[:10]]
+        if len(removed) > 10:
+            lines.append(f"... and {len(removed) - 10} more")
+        messagebox.showinfo(
+            "PDF Conversion",
+            f"{len(removed)} duplicate pages were left out:\n"
+            + "\n".join(lines))
+
     def _on_pdffolder_clicked(self) -> None:
         pdf_path = filedialog.askopenfilename(
             title="Select PDF", filetypes=[('pdf', '*.pdf')])
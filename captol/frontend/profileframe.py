@@ -0,0 +1,98 @@
+from __future__ import annotations
+import tkinter as tk
+from tkinter import BOTH
+from tkinter import filedialog, messagebox
+from typing import TYPE_CHECKING
+
+import ttkbootstrap as ttk
+
+from captol.backend.profiling import PROFILER
+from captol.utils.const import ICON_FILE
+if TYPE_CHECKING:
+    from captol.frontend.mainframe import Application
+    from captol.backend.data import Environment
+
+
+COLUMNS = ('count', 'mean', 'p50', 'p95', 'p99')
+
+
+class ProfileWindow(ttk.Frame):
+
+    def __init__(self, parent: Application, env: Environment) -> None:
+        root = self.root = ttk.Toplevel(parent)
+        root.withdraw()
+        super().__init__(root)
+        self.parent = parent
+        self.env = env
+        self.var_enabled = tk.BooleanVar()
+
+        self._setup_root()
+        self._create_widgets()
+        self._init_vars()
+        self._refresh()
+
+    def _setup_root(self) -> None:
+        try:
+            self.root.iconbitmap(ICON_FILE)
+        except FileNotFoundError:
+            pass
+        self.root.title("Capture Timings")
+        self.root.geometry('460x360')
+        self.root.resizable(False, False)
+        self.root.attributes('-topmost', True)
+        self.root.deiconify()
+
+    def _create_widgets(self) -> None:
+        ttk.Checkbutton(
+            self, text="Record timings", variable=self.var_enabled,
+            bootstyle='round-toggle',
+            command=self._on_enable_clicked).place(x=20, y=20)
+        tree = self.tree = ttk.Treeview(
+            self, columns=COLUMNS, height=8)
+        tree.heading('#0', text="stage (ms)")
+        tree.column('#0', width=100)
+        for column in COLUMNS:
+            tree.heading(column, text=column)
+            tree.column(column, width=62, anchor='e')
+        tree.place(x=20, y=60, width=420, height=230)
+        ttk.Button(
+            self, text="Refresh", command=self._refresh,
+            bootstyle='primary-button').place(x=20, y=305, width=130)
+        ttk.Button(
+            self, text="Export", command=self._on_export_clicked,
+            bootstyle='primary-outline-button').place(x=165, y=305, width=130)
+        ttk.Button(
+            self, text="Clear", command=self._on_clear_clicked,
+            bootstyle='secondary-outline-button').place(
+                x=310, y=305, width=130)
+        self.pack(fill=BOTH, expand=True)
+
+    def _init_vars(self) -> None:
+        self.var_enabled.set(PROFILER.enabled)
+
+    def _on_enable_clicked(self) -> None:
+        self.env.profiling = self.var_enabled.get()
+        PROFILER.configure(self.env)
+
+    def _on_export_clicked(self) -> None:
+        path = filedialog.asksaveasfilename(
+            title="Export", defaultextension='.jsonl',
+            filetypes=[('jsonl', '*.jsonl'), ('csv', '*.csv')])
+        if not path:
+            return
+        try:
+            PROFILER.export(path)
+        except OSError as e:
+            messagebox.showerror("Export", e)
+
+    def _on_clear_clicked(self) -> None:
+        PROFILER.clear()
+        self._refresh()
+
+    def _refresh(self) -> None:
+        tree = self.tree
+        tree.delete(*tree.get_children())
+        for name, stats in PROFILER.summary().items():
+            values = [stats['count']] + [
+                f'{stats[column]:.1f}' for column in COLUMNS[1:]]
+            tree.insert('', 'end', text=name, values=values)
@@ -8,7 +8,7 @@ from typing import TYPE_CHECKING
 
 import ttkbootstrap as ttk
 
-from captol.utils.const import ICON_FILE
+from captol.utils.const import CAPTURE_FORMATS, ICON_FILE
 if TYPE_CHECKING:
     from captol.frontend.mainframe import Application
     from captol.backend.data import Environment
@@ -27,13 +27,49 @@ class SettingsWindow(ttk.Frame):
         self.var_default_save_folder = tk.StringVar()
         self.var_pixel_difference_threshold = tk.IntVar()
         self.var_image_duplication_check_steps = tk.IntVar()
+        self.var_comparison_scale = tk.IntVar()
+        self.var_pyramid_detection_levels = tk.IntVar()
+        self.var_pyramid_detection_margin = tk.DoubleVar()
+        self.var_session_hash_index = tk.BooleanVar()
+        self.var_hash_distance_threshold = tk.IntVar()
+        self.var_prefilter = tk.BooleanVar()
+        self.var_prefilter_histogram_factor = tk.DoubleVar()
+        self.var_parallel_diff_workers = tk.IntVar()
+        self.var_parallel_diff_tile = tk.IntVar()
         self.var_auto_clip_interval = tk.DoubleVar()
+        self.var_auto_clip_max_interval = tk.DoubleVar()
+        self.var_auto_clip_backoff = tk.DoubleVar()
+        self.var_settle_samples = tk.IntVar()
+        self.var_settle_interval = tk.DoubleVar()
+        self.var_settle_timeout = tk.DoubleVar()
+        self.var_ingest_sample_interval = tk.DoubleVar()
+        self.var_ingest_seek_frames = tk.IntVar()
+        self.var_profiling = tk.BooleanVar()
+        self.var_profiling_buffer_size = tk.IntVar()
+        self.var_capture_format = tk.StringVar()
+        self.var_png_compress_level = tk.IntVar()
+        self.var_webp_method = tk.IntVar()
+        self.var_writer_threads = tk.IntVar()
+        self.var_writer_queue_size = tk.IntVar()
         self.var_compress_before_pdf_conversion = tk.BooleanVar()
         self.var_compression_ratio = tk.IntVar()
         self.var_resize_before_pdf_conversion = tk.BooleanVar()
         self.var_resized_height = tk.IntVar()
+        self.var_pdf_streaming = tk.BooleanVar()
+        self.var_pdf_chunk_size = tk.IntVar()
+        self.var_pdf_append = tk.BooleanVar()
+        self.var_pdf_workers = tk.IntVar()
+        self.var_pdf_dedup_pages = tk.BooleanVar()
+        self.var_pdf_dedup_tolerance = tk.IntVar()
+        self.var_page_cache_size_mb = tk.IntVar()
+        self.var_page_cache_dir = tk.StringVar()
         self.var_zip_converted_images = tk.BooleanVar()
+        self.var_archive_workers = tk.IntVar()
+        self.var_dedup_scale = tk.IntVar()
+        self.var_dedup_chunk_size = tk.IntVar()
         self.var_pdf_restriction = tk.BooleanVar()
+        self.var_capture_catalog = tk.BooleanVar()
+        self.var_catalog_file = tk.StringVar()
 
         self._setup_root()
         self._init_vars()
@@ -45,7 +81,7 @@ class SettingsWindow(ttk.Frame):
         except FileNotFoundError:
             pass
         self.root.title("Environment Settings")
-        self.root.geometry('460x640')
+        self.root.geometry('460x720')
         self.root.resizable(False, False)
         self.root.attributes('-topmost', True)
         self.root.protocol('WM_DELETE_WINDOW', self._on_cancel)
@@ -78,36 +114,45 @@ class SettingsWindow(ttk.Frame):
         ttk.Spinbox(
             self, textvariable=self.var_auto_clip_interval,
             from_=0.5, to=10, increment=0.1).place(x=320, y=300, width=120)
+        ttk.Label(self, text="Capture format").place(x=20, y=340)
+        ttk.Combobox(
+            self, textvariable=self.var_capture_format,
+            values=CAPTURE_FORMATS, state='readonly').place(
+                x=320, y=340, width=120)
+        ttk.Label(self, text="    - PNG compress level").place(x=20, y=380)
+        ttk.Spinbox(
+            self, textvariable=self.var_png_compress_level,
+            from_=0, to=9, increment=1).place(x=320, y=380, width=120)
         ttk.Label(
-            self, text="Compress before pdf conversion").place(x=20, y=340)
+            self, text="Compress before pdf conversion").place(x=20, y=420)
         ttk.Checkbutton(
             self, variable=self.var_compress_before_pdf_conversion,
-            command=self._on_enable_comp).place(x=375, y=345)
-        ttk.Label(self, text="    - Compression ratio").place(x=20, y=380)
+            command=self._on_enable_comp).place(x=375, y=425)
+        ttk.Label(self, text="    - Compression ratio").place(x=20, y=460)
         spb_ratio = self.spb_ratio = ttk.Spinbox(
             self, textvariable=self.var_compression_ratio, from_=60, to=90)
-        spb_ratio.place(x=320, y=380, width=120)
-        ttk.Label(self, text="Resize before pdf conversion").place(x=20, y=420)
+        spb_ratio.place(x=320, y=460, width=120)
+        ttk.Label(self, text="Resize before pdf conversion").place(x=20, y=500)
         ttk.Checkbutton(
             self, variable=self.var_resize_before_pdf_conversion,
-            command=self._on_enable_resize).place(x=375, y=425)
-        ttk.Label(self, text="    - Resized height").place(x=20, y=460)
+            command=self._on_enable_resize).place(x=375, y=505)
+        ttk.Label(self, text="    - Resized height").place(x=20, y=540)
         spb_height = self.spb_height = ttk.Spinbox(
             self, textvariable=self.var_resized_height, from_=10, to=9999)
-        spb_height.place(x=320, y=460, width=120)
-        ttk.Label(self, text="Zip converted images").place(x=20, y=500)
+        spb_height.place(x=320, y=540, width=120)
+        ttk.Label(self, text="Zip converted images").place(x=20, y=580)
         ttk.Checkbutton(
-            self, variable=self.var_zip_converted_images).place(x=375, y=505)
+            self, variable=self.var_zip_converted_images).place(x=375, y=585)
         ttk.Label(self,
-            text="Set restrictions to encrypted pdfs").place(x=20, y=540)
+            text="Set restrictions to encrypted pdfs").place(x=20, y=620)
         ttk.Checkbutton(
-            self, variable=self.var_pdf_restriction).place(x=375, y=540)
+            self, variable=self.var_pdf_restriction).place(x=375, y=620)
         ttk.Button(
             self, text="OK", command=self._on_ok,
-            bootstyle='primary-button').place(x=40, y=590, width=160)
+            bootstyle='primary-button').place(x=40, y=670, width=160)
         ttk.Button(
             self, text="Cancel", command=self._on_cancel,
-            bootstyle='primary-outline-button').place(x=260, y=590, width=160)
+            bootstyle='primary-outline-button').place(x=260, y=670, width=160)
         self.pack(fill=BOTH, expand=True)
         cbb_theme.bind(
             '<<ComboboxSelected>>',
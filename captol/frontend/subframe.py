@@ -1,7 +1,7 @@
 from __future__ import annotations
 from threading import Thread
 import tkinter as tk
-from tkinter import BOTH, LEFT, RIGHT, TOP, BOTTOM, Y
+from tkinter import BOTH, LEFT, RIGHT, TOP, BOTTOM, E, Y
 from tkinter import messagebox
 from typing import TYPE_CHECKING, Any, Callable
 
@@ -97,6 +97,8 @@ class ProgressWindow(ttk.Frame):
         self.after_funcs = list()
         self.exc_funcs = list()
         self.final_funcs = list()
+        self.done = self.total = None
+        self.var_count = tk.StringVar()
 
         self._setup_root()
         self._create_widget()
@@ -117,6 +119,9 @@ class ProgressWindow(ttk.Frame):
     def final(self, func: Callable, *args: Any) -> None:
         self.final_funcs.append(lambda: func(*args))
 
+    def progress(self, done: int, total: int) -> None:
+        self.done, self.total = done, total
+
     def _setup_root(self) -> None:
         self.root.title(self.title)
         self.root.geometry("460x85")
@@ -126,6 +131,9 @@ class ProgressWindow(ttk.Frame):
 
     def _create_widget(self) -> None:
         ttk.Label(self, text=self.text).place(x=20, y=20)
+        ttk.Label(
+            self, textvariable=self.var_count,
+            anchor=E).place(x=320, y=20, width=120)
         bar = self.bar = ttk.Progressbar(self, mode='indeterminate')
         bar.place(x=20, y=50, width=420)
         self.pack(fill=BOTH, expand=True)
@@ -152,4 +160,18 @@ class ProgressWindow(ttk.Frame):
 
     def _wait_finish(self) -> None:
         if self.thread.is_alive():
+            self._update_bar()
             return self.root.after(100, self._wait_finish)
+
+    def _update_bar(self) -> None:
+        if self.total is None:
+            return
+        try:
+            if str(self.bar['mode']) != 'determinate':
+                self.bar.stop()
+                self.bar['mode'] = 'determinate'
+            self.bar['maximum'] = max(self.total, 1)
+            self.bar['value'] = self.done
+            self.var_count.set(f"{self.done} / {self.total}")
+        except tk.TclError:
+            pass
@@ -8,3 +8,10 @@ def fullpath(*args) -> str:
 ENV_FILE = fullpath(dirname( __file__), '..', 'cache', 'env.json')
 ICON_FILE = fullpath(dirname(__file__), '..', 'icon', 'icon.ico')
 AREA_FILE = fullpath(dirname(__file__), '..', 'cache', 'areas.json')
+CATALOG_FILE = fullpath(dirname(__file__), '..', 'cache', 'catalog.sqlite3')
+PAGE_CACHE_DIR = fullpath(dirname(__file__), '..', 'cache', 'pages')
+
+DIFF_LEVEL = 50
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+CAPTURE_FORMATS = ('png', 'webp', 'bmp')
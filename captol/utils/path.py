@@ -1,6 +1,12 @@
 from __future__ import annotations
 from os.path import basename, splitext, join, dirname
-from win32api import EnumDisplayMonitors
+import re
+
+
+UNSAFE_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+RESERVED_NAMES = {
+    'CON', 'PRN', 'AUX', 'NUL',
+    *(f'COM{i}' for i in range(1, 10)), *(f'LPT{i}' for i in range(1, 10))}
 
 
 def noext_basename(path: str) -> str:
@@ -16,6 +22,17 @@ def unique_str(orgstr: str, strlist: list[str]) -> str:
     return unistr
 
 
+def safe_dirname(name: str) -> str:
+    # Windows rejects these characters, trailing dots and spaces and the
+    # device names, and a separator would leave the parent folder.
+    safe = UNSAFE_CHARS.sub('_', name).rstrip('. ')
+    if not safe.strip('.'):
+        return '_' + safe
+    if safe.split('.')[0].upper() in RESERVED_NAMES:
+        return '_' + safe
+    return safe
+
+
 def shorten(path: str, maxlen: int) -> str:
     path = path.replace('\\', '/')
     dirlist = path.split('/')